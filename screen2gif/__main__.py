@@ -0,0 +1,7 @@
+"""``python -m screen2gif``: headless command line (see cli.py)."""
+try:
+    from .cli import main
+except ImportError:
+    from cli import main
+
+raise SystemExit(main())
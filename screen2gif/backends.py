@@ -0,0 +1,444 @@
+"""Encoder backend registry with cached capability probing.
+
+Each backend declares what it can do (output formats, palette modes, whether
+it accepts streamed input, whether it encodes with multiple threads, whether
+its memory use is bounded regardless of clip length, whether it times
+frames from the capture sidecar and which extra conversion options it
+understands). The
+first call to ``probe()`` records every backend's version, codecs and a short
+micro-benchmark on a synthetic clip and caches the result on disk, keyed by a
+fingerprint of the installed tools. ``select_backend`` then routes a job to
+the fastest available backend that supports it. Backends that hold the whole
+clip in memory are only used when no bounded backend can run the job: the
+benchmark clip is tiny, so their score says nothing about full-screen
+recordings.
+"""
+import functools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+_PROBE_FILE = os.path.join(os.path.dirname(__file__), 'cache', 'backends.json')
+# large enough that per-pixel work, not process start-up, dominates the score
+_BENCH_SIZE = (640, 360)
+_BENCH_FRAMES = 20
+
+
+@functools.lru_cache(maxsize=1)
+def ffmpeg_exe() -> Optional[str]:
+    """Path to an ffmpeg binary: PATH first, then the one bundled by imageio-ffmpeg."""
+    exe = shutil.which('ffmpeg')
+    if exe:
+        return exe
+    try:
+        import imageio_ffmpeg
+        exe = imageio_ffmpeg.get_ffmpeg_exe()
+        return exe if exe and os.path.exists(exe) else None
+    except Exception:
+        return None
+
+
+def _module_version(name: str) -> Optional[str]:
+    try:
+        mod = __import__(name)
+        return str(getattr(mod, '__version__', 'unknown'))
+    except Exception:
+        return None
+
+
+class Backend:
+    name = ''
+    capabilities = {
+        'formats': (),
+        'palettes': (),
+        'streaming': False,
+        'threads': False,
+        'bounded_memory': False,
+        'timestamps': False,
+        'options': (),
+    }
+
+    def available(self) -> bool:
+        raise NotImplementedError
+
+    def probe(self) -> dict:
+        """Return version/codec information; only called when available."""
+        return {}
+
+    def convert(self, src: str, dst: str, fps: int = 10, stats: dict = None, **options) -> bool:
+        """Convert ``src`` to ``dst``; backends that can report per-run
+        statistics fill ``stats`` when it is a dict."""
+        raise NotImplementedError
+
+    def supports(self, fmt: str, palette: Optional[str] = None, streaming: bool = False,
+                 codecs: Optional[List[str]] = None, options=(), timestamps: bool = False) -> bool:
+        caps = self.capabilities
+        if timestamps and not caps.get('timestamps'):
+            return False
+        if any(o not in caps['options'] for o in options):
+            return False
+        if fmt not in caps['formats']:
+            return False
+        if codecs is not None and fmt not in codecs:
+            return False
+        if palette is not None and palette not in caps['palettes']:
+            return False
+        if streaming and not caps['streaming']:
+            return False
+        return True
+
+
+class FfmpegBackend(Backend):
+    name = 'ffmpeg'
+    capabilities = {
+        'formats': ('gif', 'webp'),
+        'palettes': ('global',),
+        'streaming': True,
+        'threads': True,
+        'bounded_memory': True,
+        'timestamps': False,
+        'options': ('start', 'end', 'crop'),
+    }
+
+    # GIFs are encoded in two passes (palette PNG, then paletteuse) because a
+    # single-graph split/palettegen buffers every decoded frame until EOF.
+    _PALETTEGEN = {
+        'global': 'palettegen',
+        'diff': 'palettegen=stats_mode=diff',
+    }
+
+    def __init__(self, palette: str = 'global'):
+        self.palette = palette
+        # an instance only ever produces its own palette mode
+        self.capabilities = dict(type(self).capabilities, palettes=(palette,))
+
+    def available(self) -> bool:
+        return ffmpeg_exe() is not None
+
+    def probe(self) -> dict:
+        exe = ffmpeg_exe()
+        info = {'path': exe, 'codecs': []}
+        try:
+            out = subprocess.run([exe, '-hide_banner', '-version'], capture_output=True, text=True).stdout
+            info['version'] = out.split('\n', 1)[0].strip()
+            enc = subprocess.run([exe, '-hide_banner', '-encoders'], capture_output=True, text=True).stdout
+            for fmt, codec in (('gif', ' gif '), ('webp', ' libwebp')):
+                if codec in enc:
+                    info['codecs'].append(fmt)
+        except Exception as e:
+            info['error'] = str(e)
+        return info
+
+    @staticmethod
+    def _trim_args(src: str, start, end) -> List[str]:
+        # Input-side -ss seeks to the keyframe before the cut instead of
+        # decoding from the start. Trim points are mapped through the capture
+        # index to container time, which differs if the recorder dropped frames.
+        if start is None and end is None:
+            return []
+        try:
+            from encoder import frame_window, probe_video
+            from sidecar import load_sidecar
+        except ImportError:
+            from .encoder import frame_window, probe_video
+            from .sidecar import load_sidecar
+        index = load_sidecar(src)
+        if index is not None:
+            fps = probe_video(src)[0] or index.get('fps') or 10.0
+            first, stop = frame_window(src, start, end, index)
+            start = first / fps if first else None
+            end = stop / fps if end is not None else None
+        args = []
+        if start:
+            args += ['-ss', f'{start:.3f}']
+        if end is not None:
+            args += ['-t', f'{max(0.0, end - (start or 0.0)):.3f}']
+        return args
+
+    def convert(self, src: str, dst: str, fps: int = 10, stats: dict = None, **options) -> bool:
+        ext = os.path.splitext(dst)[1].lower()
+        cmd = [ffmpeg_exe(), '-y', '-loglevel', 'error']
+        cmd += self._trim_args(src, options.get('start'), options.get('end'))
+        cmd += ['-i', src]
+        crop = options.get('crop')
+        pre = 'crop={2}:{3}:{0}:{1},'.format(*(int(v) for v in crop)) if crop else ''
+        if ext == '.webp':
+            return self._run(cmd + ['-vf', f'{pre}fps={fps}', '-c:v', 'libwebp', '-loop', '0', dst])
+        fd, palette = tempfile.mkstemp(prefix='s2g_palette_', suffix='.png')
+        os.close(fd)
+        try:
+            if not self._run(cmd + ['-vf', f'{pre}fps={fps},{self._PALETTEGEN[self.palette]}',
+                                    '-frames:v', '1', '-update', '1', palette]):
+                return False
+            return self._run(cmd + ['-i', palette, '-lavfi', f'{pre}fps={fps}[x];[x][1:v]paletteuse',
+                                    '-loop', '0', dst])
+        finally:
+            try:
+                os.remove(palette)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _run(cmd: List[str]) -> bool:
+        try:
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return True
+        except (subprocess.CalledProcessError, OSError):
+            return False
+
+
+class ImageioBackend(Backend):
+    name = 'imageio'
+    capabilities = {
+        'formats': ('gif',),
+        'palettes': ('global',),
+        'streaming': False,
+        'threads': False,
+        'bounded_memory': True,
+        'timestamps': True,
+        'options': (),
+    }
+
+    def available(self) -> bool:
+        return _module_version('imageio') is not None and _module_version('PIL') is not None
+
+    def probe(self) -> dict:
+        return {'version': _module_version('imageio'), 'codecs': ['gif']}
+
+    def convert(self, src: str, dst: str, fps: int = 10, stats: dict = None, **options) -> bool:
+        # imageio's own GIF writer keeps every frame in memory until close, so
+        # imageio only decodes here, twice: one pass samples frames for the
+        # palette, the second streams them into GifWriter. Neither memory nor
+        # scratch disk grows with the length of the clip.
+        try:
+            from encoder import PALETTE_SAMPLES, build_palette, encode_frames, read_frames, resample
+        except ImportError:
+            from .encoder import PALETTE_SAMPLES, build_palette, encode_frames, read_frames, resample
+        import numpy as np
+        try:
+            # build_palette only looks at a ~256 px version of each frame; keep just that
+            thumbs = (np.ascontiguousarray(f[::s, ::s]) for _, f in read_frames(src, decoder='imageio')
+                      for s in (max(1, -(-max(f.shape[:2]) // 256)),))
+            samples = _sample_stream(thumbs, PALETTE_SAMPLES)
+            if not samples:
+                return False
+            palette = build_palette(samples)
+            del samples
+            return encode_frames(resample(read_frames(src, decoder='imageio'), fps), dst, palette, stats=stats)
+        except Exception:
+            return False
+
+
+def _sample_stream(frames, count: int) -> list:
+    """Evenly spaced sample of an iterator of unknown length, holding at most ``2 * count`` items."""
+    kept, stride = [], 1
+    for i, frame in enumerate(frames):
+        if i % stride:
+            continue
+        kept.append(frame)
+        if len(kept) >= 2 * count:
+            kept = kept[::2]
+            stride *= 2
+    return kept[::max(1, len(kept) // count)][:count]
+
+
+class PillowBackend(Backend):
+    name = 'pillow'
+    capabilities = {
+        'formats': ('gif', 'webp'),
+        'palettes': ('per-frame',),
+        'streaming': False,
+        'threads': False,
+        'bounded_memory': False,
+        'timestamps': True,
+        'options': (),
+    }
+
+    def available(self) -> bool:
+        return _module_version('PIL') is not None and _module_version('cv2') is not None
+
+    def probe(self) -> dict:
+        from PIL import features
+        codecs = ['gif']
+        if features.check('webp'):
+            codecs.append('webp')
+        return {'version': _module_version('PIL'), 'codecs': codecs}
+
+    def convert(self, src: str, dst: str, fps: int = 10, stats: dict = None, **options) -> bool:
+        from PIL import Image
+        try:
+            from encoder import read_frames, resample
+        except ImportError:
+            from .encoder import read_frames, resample
+        try:
+            frames, durations = [], []
+            for frame, duration_ms in resample(read_frames(src), fps):
+                frames.append(Image.fromarray(frame))
+                durations.append(int(round(duration_ms)))
+            if not frames:
+                return False
+            frames[0].save(dst, save_all=True, append_images=frames[1:], duration=durations, loop=0)
+            return True
+        except Exception:
+            return False
+
+
+class InProcessBackend(Backend):
+    name = 'inprocess'
+    capabilities = {
+        'formats': ('gif',),
+        'palettes': ('global',),
+        'streaming': True,
+        'threads': False,
+        'bounded_memory': True,
+        'timestamps': True,
+        'options': ('dither', 'dither_strength', 'vfr', 'decimate', 'start', 'end', 'crop'),
+    }
+
+    def available(self) -> bool:
+        return all(_module_version(m) for m in ('numpy', 'PIL', 'cv2'))
+
+    def probe(self) -> dict:
+        return {'version': _module_version('numpy'), 'codecs': ['gif']}
+
+    def convert(self, src: str, dst: str, fps: int = 10, stats: dict = None, **options) -> bool:
+        try:
+            from encoder import encode_gif
+        except ImportError:
+            from .encoder import encode_gif
+        try:
+            return encode_gif(src, dst, fps=fps, stats=stats, **options)
+        except Exception:
+            return False
+
+
+_REGISTRY: Dict[str, Backend] = {}
+_probe_lock = threading.Lock()
+_probe_result = None
+
+
+def register(backend: Backend):
+    _REGISTRY[backend.name] = backend
+
+
+def get_backend(name: str) -> Backend:
+    return _REGISTRY[name]
+
+
+def backends() -> List[Backend]:
+    return list(_REGISTRY.values())
+
+
+for _b in (FfmpegBackend(), ImageioBackend(), PillowBackend(), InProcessBackend()):
+    register(_b)
+
+
+def _fingerprint() -> str:
+    parts = [sys.version.split()[0], ','.join(sorted(_REGISTRY))]
+    exe = ffmpeg_exe()
+    if exe:
+        try:
+            parts.append(f'{exe}:{os.path.getmtime(exe)}')
+        except OSError:
+            parts.append(exe)
+    for mod in ('imageio', 'PIL', 'cv2', 'numpy'):
+        parts.append(f'{mod}={_module_version(mod)}')
+    return '|'.join(parts)
+
+
+def _make_bench_clip(path: str) -> bool:
+    try:
+        import cv2
+        import numpy as np
+    except ImportError:
+        return False
+    w, h = _BENCH_SIZE
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 10, (w, h))
+    ramp = np.linspace(0, 255, w, dtype=np.uint8)[None, :, None]
+    for i in range(_BENCH_FRAMES):
+        frame = np.broadcast_to(ramp, (h, w, 3)).copy()
+        frame[h // 4:h // 2, i * 16:i * 16 + 64] = (0, 0, 255)
+        writer.write(frame)
+    writer.release()
+    return os.path.exists(path) and os.path.getsize(path) > 0
+
+
+def _run_probe() -> dict:
+    results = {}
+    tmpdir = tempfile.mkdtemp(prefix='s2g_probe_')
+    try:
+        clip = os.path.join(tmpdir, 'bench.mp4')
+        have_clip = _make_bench_clip(clip)
+        for b in backends():
+            entry = {'available': False}
+            try:
+                entry['available'] = bool(b.available())
+                if entry['available']:
+                    entry.update(b.probe())
+            except Exception as e:
+                entry['available'] = False
+                entry['error'] = str(e)
+            if entry['available'] and have_clip:
+                out = os.path.join(tmpdir, f'{b.name}.gif')
+                t0 = time.perf_counter()
+                ok = b.convert(clip, out, fps=10)
+                entry['bench_s'] = time.perf_counter() - t0 if ok else None
+            results[b.name] = entry
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    return results
+
+
+def probe(refresh: bool = False) -> dict:
+    """Return cached probe results, probing (and writing the cache) if needed."""
+    global _probe_result
+    with _probe_lock:
+        if _probe_result is not None and not refresh:
+            return _probe_result
+        fp = _fingerprint()
+        if not refresh:
+            try:
+                with open(_PROBE_FILE, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('fingerprint') == fp:
+                    _probe_result = data['backends']
+                    return _probe_result
+            except Exception:
+                pass
+        _probe_result = _run_probe()
+        try:
+            os.makedirs(os.path.dirname(_PROBE_FILE), exist_ok=True)
+            with open(_PROBE_FILE, 'w', encoding='utf-8') as f:
+                json.dump({'fingerprint': fp, 'probed_at': time.time(), 'backends': _probe_result}, f, indent=2)
+        except Exception:
+            pass
+        return _probe_result
+
+
+def candidates(fmt: str = 'gif', palette: Optional[str] = None, streaming: bool = False,
+               options=(), timestamps: bool = False) -> List[Backend]:
+    """Backends able to run the job, memory-bounded ones first, each group fastest first."""
+    info = probe()
+    out = []
+    for b in backends():
+        entry = info.get(b.name) or {}
+        if not entry.get('available'):
+            continue
+        if not b.supports(fmt, palette=palette, streaming=streaming, codecs=entry.get('codecs'), options=options,
+                          timestamps=timestamps):
+            continue
+        out.append(b)
+    bench = lambda b: info[b.name].get('bench_s') if info[b.name].get('bench_s') is not None else float('inf')
+    return sorted(out, key=lambda b: (not b.capabilities.get('bounded_memory'), bench(b)))
+
+
+def select_backend(fmt: str = 'gif', palette: Optional[str] = None, streaming: bool = False,
+                   options=(), timestamps: bool = False) -> Optional[Backend]:
+    found = candidates(fmt, palette=palette, streaming=streaming, options=options, timestamps=timestamps)
+    return found[0] if found else None
@@ -0,0 +1,227 @@
+"""Batch MP4 -> GIF conversion on a worker pool.
+
+Usage:
+    python batch.py video/ "runs/**/*.mp4" clip.mp4 --jobs 4 --mem-mb 1024
+
+Inputs may be files, directories (their *.mp4 files) or glob patterns.
+Outputs mirror the inputs' paths below their common directory, so
+``runs/a/clip.mp4`` and ``runs/b/clip.mp4`` become ``a/clip.gif`` and
+``b/clip.gif``. Outputs that are newer than their source are skipped, finished jobs are
+recorded in a state file in the output directory so an interrupted batch
+resumes where it stopped, and GIFs are written under a temporary name and
+renamed when complete so a killed worker never leaves a truncated output.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional
+
+try:
+    from backends import probe
+    from converter import convert_mp4_to_gif
+    from encoder import probe_video
+    from utils import ensure_dirs, timestamped_filename
+except ImportError:
+    from .backends import probe
+    from .converter import convert_mp4_to_gif
+    from .encoder import probe_video
+    from .utils import ensure_dirs, timestamped_filename
+
+STATE_FILE = '.batch_state.json'
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
+
+def collect_inputs(patterns: List[str]) -> List[str]:
+    found = []
+    for p in patterns:
+        if os.path.isdir(p):
+            for name in sorted(os.listdir(p)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    found.append(os.path.join(p, name))
+        elif os.path.isfile(p):
+            found.append(p)
+        else:
+            found.extend(sorted(glob.glob(p, recursive=True)))
+    seen = set()
+    out = []
+    for f in found:
+        a = os.path.abspath(f)
+        if a not in seen and os.path.isfile(a):
+            seen.add(a)
+            out.append(a)
+    return out
+
+
+def input_root(inputs: List[str]) -> str:
+    """Deepest directory containing every input; outputs mirror paths below it."""
+    dirs = [os.path.dirname(os.path.abspath(f)) for f in inputs]
+    try:
+        return os.path.commonpath(dirs) if dirs else ''
+    except ValueError:  # inputs on different drives
+        return ''
+
+
+def output_for(src: str, out_dir: str, root: str = None) -> str:
+    src = os.path.abspath(src)
+    rel = os.path.relpath(src, root) if root else os.path.basename(src)
+    if rel.startswith(os.pardir):
+        rel = os.path.basename(src)
+    return os.path.join(out_dir, os.path.splitext(rel)[0] + '.gif')
+
+
+def is_up_to_date(src: str, dst: str) -> bool:
+    try:
+        return os.path.getmtime(dst) >= os.path.getmtime(src) and os.path.getsize(dst) > 0
+    except OSError:
+        return False
+
+
+def _load_state(out_dir: str) -> dict:
+    try:
+        with open(os.path.join(out_dir, STATE_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _save_state(out_dir: str, state: dict):
+    path = os.path.join(out_dir, STATE_FILE)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp, path)
+
+
+def _limit_memory(mem_mb: Optional[int]):
+    # Per-job cap on virtual address space (RLIMIT_AS, POSIX only), not on
+    # RSS: mapped libraries and thread stacks count against it, so leave
+    # headroom above the resident size a job needs. ffmpeg child processes
+    # inherit it too.
+    if not mem_mb:
+        return
+    try:
+        import resource
+        limit = int(mem_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except Exception:
+        pass
+
+
+def _frame_count(src: str) -> int:
+    try:
+        return probe_video(src)[1]
+    except (OSError, ValueError):
+        return 0
+
+
+def _convert_job(src: str, dst: str, fps: int) -> dict:
+    t0 = time.perf_counter()
+    try:
+        # publishes dst through its own .part file, so a killed run leaves no partial GIF
+        ok = convert_mp4_to_gif(src, dst, fps=fps)
+    except MemoryError:
+        ok = False
+    return {
+        'src': src,
+        'dst': dst,
+        'ok': bool(ok),
+        'seconds': time.perf_counter() - t0,
+        'frames': _frame_count(src) if ok else 0,
+        'bytes_in': os.path.getsize(src),
+        'bytes_out': os.path.getsize(dst) if ok else 0,
+    }
+
+
+def run_batch(inputs: List[str], out_dir: str, fps: int = 10, jobs: int = None,
+              mem_mb: Optional[int] = None, force: bool = False) -> dict:
+    os.makedirs(out_dir, exist_ok=True)
+    # state is keyed by output path: two sources never share an output
+    state = _load_state(out_dir)
+    root = input_root(inputs)
+    todo, skipped = [], []
+    for src in inputs:
+        dst = output_for(src, out_dir, root)
+        done = state.get(dst)
+        if not force and is_up_to_date(src, dst) and (done is None or done.get('ok')):
+            skipped.append(src)
+            continue
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        todo.append((src, dst))
+
+    results = []
+    t0 = time.perf_counter()
+    if todo:
+        probe()  # warm the backend probe cache once instead of in every worker
+        with ProcessPoolExecutor(max_workers=jobs or os.cpu_count(), initializer=_limit_memory,
+                                 initargs=(mem_mb,)) as pool:
+            futures = {pool.submit(_convert_job, src, dst, fps): (src, dst) for src, dst in todo}
+            for fut in as_completed(futures):
+                src, dst = futures[fut]
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    res = {'src': src, 'dst': dst, 'ok': False, 'error': str(e),
+                           'seconds': 0.0, 'frames': 0, 'bytes_in': 0, 'bytes_out': 0}
+                results.append(res)
+                state[dst] = {'ok': res['ok'], 'src': src, 'finished': time.time()}
+                _save_state(out_dir, state)
+                print(f"[{len(results)}/{len(todo)}] {'ok  ' if res['ok'] else 'FAIL'} {os.path.relpath(dst, out_dir)}"
+                      f" ({res['seconds']:.1f}s)")
+    elapsed = time.perf_counter() - t0
+
+    converted = [r for r in results if r['ok']]
+    frames = sum(r['frames'] for r in converted)
+    mb_in = sum(r['bytes_in'] for r in converted) / (1024 * 1024)
+    return {
+        'converted': len(converted),
+        'failed': [r['src'] for r in results if not r['ok']],
+        'skipped': len(skipped),
+        'elapsed_s': elapsed,
+        'frames': frames,
+        'frames_per_s': frames / elapsed if elapsed > 0 else 0.0,
+        'mb_in': mb_in,
+        'mb_per_s': mb_in / elapsed if elapsed > 0 else 0.0,
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert many recordings to GIF in parallel')
+    parser.add_argument('inputs', nargs='+', help='Files, directories or glob patterns')
+    parser.add_argument('--out', type=str, default=None, help='Output directory (default: gif/)')
+    parser.add_argument('--fps', type=int, default=10, help='Output frames per second')
+    parser.add_argument('--jobs', type=int, default=None, help='Concurrent conversions (default: CPU count)')
+    parser.add_argument('--mem-mb', type=int, default=None, help='Per-job address-space (virtual memory, not RSS) cap in MB (POSIX only)')
+    parser.add_argument('--force', action='store_true', help='Reconvert even if outputs are up to date')
+    args = parser.parse_args(argv)
+
+    ensure_dirs()
+    out_dir = args.out or os.path.join(os.path.dirname(__file__), 'gif')
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        print('No input videos found')
+        return 1
+
+    summary = run_batch(inputs, out_dir, fps=args.fps, jobs=args.jobs, mem_mb=args.mem_mb, force=args.force)
+    print(f"Converted {summary['converted']}, skipped {summary['skipped']} up to date, "
+          f"failed {len(summary['failed'])} in {summary['elapsed_s']:.1f}s")
+    print(f"Throughput: {summary['frames_per_s']:.1f} frames/s, {summary['mb_per_s']:.2f} MB/s")
+    for f in summary['failed']:
+        print(f'  failed: {f}')
+
+    report = timestamped_filename('logs', 'json')
+    try:
+        with open(report, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=1)
+        print(f'Report: {report}')
+    except OSError:
+        pass
+    return 0 if not summary['failed'] else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""Content-addressed cache for conversion outputs.
+
+Entries are keyed by a hash of the source file content plus the normalized
+conversion parameters, so re-exporting the same recording with the same
+settings returns the previous output without running the converter again.
+The cache directory is bounded in size and evicts least-recently-used entries.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Optional
+
+try:
+    from utils import part_path, publish
+except ImportError:
+    from .utils import part_path, publish
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+_INDEX_NAME = 'index.json'
+_CHUNK = 1024 * 1024
+
+
+def normalize_params(params: dict) -> str:
+    """Return a canonical JSON string for conversion parameters.
+
+    Keys are sorted, ``None`` values are dropped and whole floats collapse to
+    ints so that ``fps=10`` and ``fps=10.0`` share a cache entry.
+    """
+    def _norm(v):
+        if isinstance(v, float) and v.is_integer():
+            return int(v)
+        if isinstance(v, dict):
+            return {k: _norm(x) for k, x in v.items() if x is not None}
+        if isinstance(v, (list, tuple)):
+            return [_norm(x) for x in v]
+        return v
+
+    return json.dumps(_norm(params or {}), sort_keys=True, separators=(',', ':'))
+
+
+def hash_file(path: str) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ConversionCache:
+    def __init__(self, cache_dir: str = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(__file__), 'cache', 'conversions')
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    # -- index persistence -------------------------------------------------
+
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, _INDEX_NAME)
+
+    def _load_index(self) -> dict:
+        index = {'entries': {}, 'sources': {}, 'hits': 0, 'misses': 0}
+        try:
+            with open(self._index_path(), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            index.update({k: data[k] for k in index if k in data})
+        except Exception:
+            pass
+        # drop entries and memoized hashes whose files disappeared behind our back
+        for src in list(index['sources']):
+            if not os.path.exists(src):
+                del index['sources'][src]
+        for key in list(index['entries']):
+            if not os.path.exists(os.path.join(self.cache_dir, index['entries'][key]['file'])):
+                del index['entries'][key]
+        return index
+
+    def _save_index(self):
+        tmp = self._index_path() + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp, self._index_path())
+        except Exception:
+            pass
+
+    # -- keys ----------------------------------------------------------------
+
+    def _source_digest(self, src_path: str) -> str:
+        # Memoize content hashes by (size, mtime) so repeated lookups of a large
+        # recording don't re-read the whole file.
+        src = os.path.abspath(src_path)
+        st = os.stat(src)
+        memo = self._index['sources'].get(src)
+        if memo and memo[0] == st.st_size and memo[1] == st.st_mtime_ns:
+            return memo[2]
+        digest = hash_file(src)
+        self._index['sources'][src] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def key_for(self, src_path: str, params: dict) -> str:
+        with self._lock:
+            digest = self._source_digest(src_path)
+        h = hashlib.blake2b(digest_size=20)
+        h.update(digest.encode('ascii'))
+        h.update(normalize_params(params).encode('utf-8'))
+        return h.hexdigest()
+
+    # -- lookup / store ------------------------------------------------------
+
+    def lookup(self, src_path: str, params: dict) -> Optional[str]:
+        """Return the cached output path for ``src_path``/``params`` or None."""
+        try:
+            key = self.key_for(src_path, params)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._index['entries'].get(key)
+            path = os.path.join(self.cache_dir, entry['file']) if entry else None
+            if path and os.path.exists(path):
+                entry['last_access'] = time.time()
+                self._index['hits'] += 1
+                self._save_index()
+                return path
+            if entry:
+                del self._index['entries'][key]
+            self._index['misses'] += 1
+            self._save_index()
+            return None
+
+    def fetch(self, src_path: str, params: dict, dest_path: str) -> bool:
+        """Materialize a cached output at ``dest_path``. Returns True on a hit."""
+        cached = self.lookup(src_path, params)
+        if not cached:
+            return False
+        if os.path.abspath(cached) == os.path.abspath(dest_path):
+            return True
+        tmp = part_path(dest_path)
+        try:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            os.link(cached, tmp)
+        except OSError:
+            try:
+                shutil.copyfile(cached, tmp)
+            except OSError:
+                return publish(tmp, dest_path, False)
+        return publish(tmp, dest_path)
+
+    def store(self, src_path: str, params: dict, output_path: str) -> Optional[str]:
+        """Add ``output_path`` to the cache and evict old entries if needed."""
+        try:
+            key = self.key_for(src_path, params)
+            ext = os.path.splitext(output_path)[1]
+            name = key + ext
+            dest = os.path.join(self.cache_dir, name)
+            tmp = dest + '.tmp'
+            try:
+                os.link(output_path, tmp)
+            except OSError:
+                shutil.copyfile(output_path, tmp)
+            os.replace(tmp, dest)
+            size = os.path.getsize(dest)
+        except OSError:
+            return None
+        now = time.time()
+        with self._lock:
+            self._index['entries'][key] = {
+                'file': name,
+                'size': size,
+                'created': now,
+                'last_access': now,
+                'params': json.loads(normalize_params(params)),
+            }
+            self._evict_locked()
+            self._save_index()
+        return dest
+
+    # -- eviction / stats ----------------------------------------------------
+
+    def _evict_locked(self) -> int:
+        entries = self._index['entries']
+        total = sum(e['size'] for e in entries.values())
+        removed = 0
+        for key, entry in sorted(entries.items(), key=lambda kv: kv[1]['last_access']):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, entry['file']))
+            except OSError:
+                pass
+            total -= entry['size']
+            del entries[key]
+            removed += 1
+        return removed
+
+    def evict(self) -> int:
+        with self._lock:
+            removed = self._evict_locked()
+            self._save_index()
+        return removed
+
+    def clear(self):
+        with self._lock:
+            for entry in self._index['entries'].values():
+                try:
+                    os.remove(os.path.join(self.cache_dir, entry['file']))
+                except OSError:
+                    pass
+            self._index = {'entries': {}, 'sources': {}, 'hits': 0, 'misses': 0}
+            self._save_index()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._index['entries']
+            hits = self._index['hits']
+            misses = self._index['misses']
+            return {
+                'entries': len(entries),
+                'bytes': sum(e['size'] for e in entries.values()),
+                'max_bytes': self.max_bytes,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            }
+
+
+_default_cache = None
+
+
+def default_cache() -> ConversionCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ConversionCache()
+    return _default_cache
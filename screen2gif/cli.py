@@ -0,0 +1,177 @@
+"""Headless command line for the record -> convert -> clipboard pipeline.
+
+Usage:
+    python -m screen2gif record --region 0 0 640 480 --duration 5 --fps 10 --format gif --copy
+    python -m screen2gif daemon
+    python -m screen2gif ctl start region=[0,0,640,480] fps=10
+
+Runs the same ``ScreenRecorder`` and converter as the GUI but never imports
+PyQt5, so it starts quickly and can be scripted. The output path is printed
+on stdout; progress and errors go to stderr.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Optional
+
+try:
+    from converter import convert_mp4_to_gif
+    from library import record_finished
+    from recorder import ScreenRecorder
+    from storage import recording_finished
+    from utils import ensure_dirs, scratch_filename, timestamped_filename
+except ImportError:
+    from .converter import convert_mp4_to_gif
+    from .library import record_finished
+    from .recorder import ScreenRecorder
+    from .storage import recording_finished
+    from .utils import ensure_dirs, scratch_filename, timestamped_filename
+
+FORMATS = ('gif', 'webp', 'mp4')
+
+
+def _primary_region():
+    import mss
+    with mss.mss() as sct:
+        m = sct.monitors[1]
+        return m['left'], m['top'], m['width'], m['height']
+
+
+def _log(msg: str):
+    print(msg, file=sys.stderr, flush=True)
+
+
+def record(region, duration: float, fps: int = 10, fmt: str = 'gif', output: str = None,
+           copy: bool = False, backend: str = None, timelapse: dict = None) -> Optional[str]:
+    """Record ``region`` for ``duration`` seconds and return the output path (None on failure).
+
+    ``timelapse`` enables change-triggered capture (see ``ScreenRecorder.start``).
+    """
+    ensure_dirs()
+    out = output or timestamped_filename('video' if fmt == 'mp4' else 'gif', fmt)
+    # GIF/WebP are encoded live when ffmpeg is available; otherwise an MP4 is
+    # recorded and converted afterwards.
+    if fmt == 'mp4' or ScreenRecorder.can_stream(out):
+        target = out
+    elif fmt == 'gif':
+        target = scratch_filename('mp4')
+    else:
+        _log(f'{fmt} output needs ffmpeg')
+        return None
+    rec = ScreenRecorder()
+    _log(f'recording {region} for {duration}s at {fps} fps -> {target}')
+    rec.start(tuple(region), fps=fps, out_path=target, timelapse=timelapse)
+    end = time.monotonic() + duration
+    try:
+        while time.monotonic() < end and rec._thread.is_alive():
+            time.sleep(min(0.1, max(0.0, end - time.monotonic())))
+    except KeyboardInterrupt:
+        _log('interrupted, finishing recording')
+    result = rec.stop()
+    if rec.last_stats:
+        if 'polls' in rec.last_stats:
+            _log(f"timelapse: {rec.last_stats['frames_committed']} of {rec.last_stats['polls']} polls committed")
+        if 'frames_written' in rec.last_stats:
+            _log(f"frames {rec.last_stats.get('frames_written')}, dropped {rec.last_stats.get('frames_dropped')}")
+    if not result:
+        _log('no recording produced')
+        return None
+    if result != out:
+        stats = {}
+        # no cache: the intermediate is unique and deleted right after this
+        if not convert_mp4_to_gif(result, out, fps=fps, cache=None, backend=backend,
+                                  vfr=True, stats=stats):
+            _log('conversion failed')
+            return None
+        _log(f"converted with {stats.get('backend', 'cache' if stats.get('cached') else '?')}")
+    record_finished(out, region=region, fps=fps, source=None if result == out else result, wait=True)
+    recording_finished(out, intermediate=None if result == out else result, wait=True)
+    if copy:
+        try:
+            from clipboard_clean import copy_path_to_clipboard
+        except ImportError:
+            from .clipboard_clean import copy_path_to_clipboard
+        if not copy_path_to_clipboard(out):
+            _log('could not copy to clipboard')
+    return out
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='screen2gif', description='Headless screen recording')
+    sub = parser.add_subparsers(dest='command')
+    rec = sub.add_parser('record', help='record a screen region and convert it')
+    rec.add_argument('--region', type=int, nargs=4, metavar=('X', 'Y', 'W', 'H'),
+                     help='capture rectangle (default: primary monitor)')
+    rec.add_argument('--duration', type=float, default=5.0, help='seconds to record')
+    rec.add_argument('--fps', type=int, default=10)
+    rec.add_argument('--format', choices=FORMATS, default='gif')
+    rec.add_argument('--output', help='output path (default: timestamped file under gif/ or video/)')
+    rec.add_argument('--backend', help='force a conversion backend')
+    rec.add_argument('--copy', action='store_true', help='copy the output file to the clipboard')
+    rec.add_argument('--timelapse', action='store_true',
+                     help='poll slowly and keep only frames that changed; output plays at --fps')
+    rec.add_argument('--poll', type=float, help='timelapse: seconds between polls')
+    rec.add_argument('--threshold', type=float, help='timelapse: mean gray-level change that commits a frame')
+    rec.add_argument('--max-interval', type=float, help='timelapse: commit a frame at least this often (seconds)')
+    dmn = sub.add_parser('daemon', help='serve recording commands on a local socket')
+    dmn.add_argument('--socket', help='socket path (default: $XDG_RUNTIME_DIR/screen2gif-<uid>.sock)')
+    dmn.add_argument('--no-warm', action='store_true', help='skip the backend probe at startup')
+    ctl = sub.add_parser('ctl', help='send a command to a running daemon')
+    ctl.add_argument('cmd', help='ping, start, stop, record, convert, status or shutdown')
+    ctl.add_argument('args', nargs='*', metavar='KEY=VALUE', help='arguments; values are parsed as JSON when possible')
+    ctl.add_argument('--socket', help='socket path')
+    return parser
+
+
+def _ctl_payload(cmd: str, pairs: List[str]) -> dict:
+    payload = {'cmd': cmd}
+    for pair in pairs:
+        key, _, value = pair.partition('=')
+        try:
+            payload[key] = json.loads(value)
+        except ValueError:
+            payload[key] = value
+    return payload
+
+
+def main(argv: List[str] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'record':
+        region = args.region or _primary_region()
+        timelapse = None
+        if args.timelapse:
+            timelapse = {k: v for k, v in (('poll', args.poll), ('threshold', args.threshold),
+                                           ('max_interval', args.max_interval)) if v is not None}
+        out = record(region, args.duration, fps=args.fps, fmt=args.format, output=args.output,
+                     copy=args.copy, backend=args.backend, timelapse=timelapse)
+        if not out:
+            return 1
+        print(os.path.abspath(out))
+        return 0
+    if args.command == 'daemon':
+        try:
+            from daemon import serve
+        except ImportError:
+            from .daemon import serve
+        return serve(args.socket, warm=not args.no_warm)
+    if args.command == 'ctl':
+        try:
+            from daemon import request
+        except ImportError:
+            from .daemon import request
+        try:
+            reply = request(_ctl_payload(args.cmd, args.args), args.socket)
+        except OSError as e:
+            _log(f'cannot reach daemon: {e}')
+            return 1
+        print(json.dumps(reply, indent=2, default=str))
+        return 0 if reply.get('ok') else 1
+    parser.print_help()
+    return 2
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
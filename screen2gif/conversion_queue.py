@@ -0,0 +1,77 @@
+"""Background MP4 -> GIF conversion queue for the Qt GUI.
+
+Conversions run as ``QRunnable`` jobs on a private ``QThreadPool`` so the GUI
+thread returns to the launcher (and can start the next recording) as soon
+as a capture stops. Completion is reported through the ``finished`` signal,
+which Qt delivers on the GUI thread. The pool defaults to one worker so
+conversions run in submission order and leave CPU for an ongoing capture.
+"""
+from PyQt5 import QtCore
+
+try:
+    from cache import default_cache
+    from converter import convert_mp4_to_gif
+except ImportError:
+    from .cache import default_cache
+    from .converter import convert_mp4_to_gif
+
+
+class _Signals(QtCore.QObject):
+    done = QtCore.pyqtSignal(str, str, bool)
+
+
+class _ConversionJob(QtCore.QRunnable):
+    def __init__(self, src: str, dst: str, options: dict, signals: _Signals, use_cache: bool):
+        super().__init__()
+        self.src = src
+        self.dst = dst
+        self.options = options
+        self.signals = signals
+        self.use_cache = use_cache
+
+    def run(self):
+        try:
+            cache = default_cache() if self.use_cache else None
+            ok = bool(convert_mp4_to_gif(self.src, self.dst, cache=cache, **self.options))
+        except Exception:
+            ok = False
+        self.signals.done.emit(self.src, self.dst, ok)
+
+
+class ConversionQueue(QtCore.QObject):
+    # gif path, success
+    finished = QtCore.pyqtSignal(str, bool)
+    # number of queued + running conversions
+    pending_changed = QtCore.pyqtSignal(int)
+
+    def __init__(self, max_threads: int = 1, parent=None):
+        super().__init__(parent)
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._signals = _Signals()
+        self._signals.done.connect(self._on_done)
+        self._pending = 0
+
+    def submit(self, mp4_path: str, gif_path: str, use_cache: bool = False, **options):
+        """Queue ``mp4_path`` for conversion; ``options`` go to ``convert_mp4_to_gif``.
+
+        The conversion cache is off by default: a freshly recorded intermediate
+        is unique and deleted after conversion, so it could never be hit and
+        would only cost a full hash plus a cached copy of the GIF.
+        """
+        job = _ConversionJob(mp4_path, gif_path, options, self._signals, use_cache)
+        self._pending += 1
+        self.pending_changed.emit(self._pending)
+        self._pool.start(job)
+
+    def pending(self) -> int:
+        return self._pending
+
+    def wait(self, msecs: int = -1) -> bool:
+        """Block until all queued conversions finished (or ``msecs`` elapsed)."""
+        return self._pool.waitForDone(msecs)
+
+    def _on_done(self, src: str, dst: str, ok: bool):
+        self._pending = max(0, self._pending - 1)
+        self.pending_changed.emit(self._pending)
+        self.finished.emit(dst, ok)
@@ -1,36 +1,125 @@
-import shutil
-import subprocess
 import os
-import imageio
+
+try:
+    from backends import candidates, ffmpeg_exe, get_backend
+    from memory import RssMonitor
+    from renditions import Rendition, encode_renditions
+    from sidecar import load_sidecar
+    from utils import atomic_write
+except ImportError:
+    from .backends import candidates, ffmpeg_exe, get_backend
+    from .memory import RssMonitor
+    from .renditions import Rendition, encode_renditions
+    from .sidecar import load_sidecar
+    from .utils import atomic_write
 
 
 def has_ffmpeg():
-    return shutil.which('ffmpeg') is not None
+    return ffmpeg_exe() is not None
+
+
+def needs_timestamps(mp4_path: str) -> bool:
+    """True if the capture sidecar's frame times differ from the container's even spacing.
+
+    Such recordings (dropped frames, capture gaps) must go to a backend that
+    reads the sidecar, or the output length would depend on the backend.
+    """
+    sc = load_sidecar(mp4_path)
+    if not sc or not sc['timestamps']:
+        return False
+    fps = float(sc.get('fps') or 0)
+    if fps <= 0:
+        return True
+    ts = sc['timestamps']
+    return any(abs(t - ts[0] - i / fps) > 0.5 / fps for i, t in enumerate(ts))
 
 
-def convert_mp4_to_gif(mp4_path: str, gif_path: str, fps: int = 10) -> bool:
-    # Use ffmpeg when available for quality
-    if has_ffmpeg():
-        cmd = [
-            'ffmpeg', '-y', '-i', mp4_path,
-            '-vf', f'fps={fps},scale=iw:ih:flags=lanczos',
-            '-loop', '0', gif_path
-        ]
+def convert_mp4_to_gif(mp4_path: str, gif_path: str, fps: int = 10, cache=None, backend: str = None,
+                       dither: str = None, dither_strength: float = None, vfr: bool = None,
+                       decimate: float = None, start: float = None, end: float = None, crop=None,
+                       stats: dict = None) -> bool:
+    # Only options that were actually requested take part in backend routing
+    options = {k: v for k, v in (('dither', dither), ('dither_strength', dither_strength), ('vfr', vfr),
+                                 ('decimate', decimate), ('start', start), ('end', end),
+                                 ('crop', tuple(crop) if crop else None)) if v is not None}
+    # Serve repeated exports of the same recording/settings from the cache
+    params = dict(options, format='gif', fps=fps, backend=backend)
+    if cache is not None:
         try:
-            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            return True
-        except subprocess.CalledProcessError:
-            return False
+            if cache.fetch(mp4_path, params, gif_path):
+                if stats is not None:
+                    stats['cached'] = True
+                return True
+        except Exception:
+            pass
+
+    # backends write to a .part file; gif_path only ever appears complete
+    ok = atomic_write(gif_path, lambda tmp: _convert(mp4_path, tmp, fps, backend, options, stats))
+    if ok and cache is not None:
+        try:
+            cache.store(mp4_path, params, gif_path)
+        except Exception:
+            pass
+    return ok
+
 
-    # Fallback: use imageio to read video and write GIF
-    try:
-        reader = imageio.get_reader(mp4_path)
-        frames = []
-        for im in reader:
-            frames.append(im)
-        if not frames:
+def _convert(mp4_path: str, gif_path: str, fps: int, backend: str = None, options: dict = None,
+             stats: dict = None) -> bool:
+    # An explicit backend is used as-is; otherwise try capable backends
+    # fastest-first (per the cached probe) until one succeeds.
+    options = options or {}
+    if backend:
+        chain = [get_backend(backend)]
+        if not chain[0].supports('gif', options=options):
             return False
-        imageio.mimsave(gif_path, frames, fps=fps)
-        return True
-    except Exception:
-        return False
+    else:
+        chain = candidates('gif', options=tuple(options), timestamps=needs_timestamps(mp4_path))
+    # RSS is sampled to logs/memory.log for the whole run
+    with RssMonitor(label=f'convert {os.path.basename(mp4_path)}') as mon:
+        for b in chain:
+            if b.convert(mp4_path, gif_path, fps=fps, stats=stats, **options):
+                if stats is not None:
+                    stats['backend'] = b.name
+                    stats['peak_rss'] = max(mon.peak, mon.sample())
+                return True
+    return False
+
+
+def convert_mp4_to_renditions(mp4_path: str, renditions, fps: int = 10, cache=None, vfr: bool = None,
+                              start: float = None, end: float = None, crop=None, stats: dict = None):
+    """Write several renditions (``renditions.Rendition``) of one recording.
+
+    Renditions already in ``cache`` are fetched; the rest are produced by a
+    single in-process decode pass. Returns a list of per-rendition results.
+    """
+    renditions = [r if isinstance(r, Rendition) else Rendition(**r) for r in renditions]
+    shared = {k: v for k, v in (('vfr', vfr), ('start', start), ('end', end),
+                                ('crop', tuple(crop) if crop else None)) if v is not None}
+    results = [False] * len(renditions)
+    todo = []
+    for i, r in enumerate(renditions):
+        params = dict(shared, fps=fps, rendition=r.params())
+        try:
+            if cache is not None and cache.fetch(mp4_path, params, r.path):
+                results[i] = True
+                continue
+        except Exception:
+            pass
+        todo.append((i, r, params))
+    if stats is not None:
+        stats['cached'] = len(renditions) - len(todo)
+    if not todo:
+        return results
+    with RssMonitor(label=f'renditions {os.path.basename(mp4_path)}') as mon:
+        done = encode_renditions(mp4_path, [r for _, r, _ in todo], fps=fps, vfr=bool(vfr),
+                                 start=start, end=end, crop=crop, stats=stats)
+        if stats is not None:
+            stats['peak_rss'] = max(mon.peak, mon.sample())
+    for (i, r, params), ok in zip(todo, done):
+        results[i] = ok
+        if ok and cache is not None:
+            try:
+                cache.store(mp4_path, params, r.path)
+            except Exception:
+                pass
+    return results
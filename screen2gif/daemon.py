@@ -0,0 +1,339 @@
+"""Long-running recording daemon controlled over a Unix domain socket.
+
+The daemon imports the capture and encoding stack once, probes the
+conversion backends at startup and then serves requests, so starting a
+recording only costs spawning the capture thread. The protocol is one JSON
+object per line in each direction::
+
+    {"cmd": "start", "region": [0, 0, 640, 480], "fps": 10, "format": "gif"}
+    {"ok": true, "path": ".../gif/20240101_120000.gif"}
+
+Commands:
+
+``ping``
+    liveness check.
+``start`` (region, fps, format, output, timelapse)
+    start the interactive recording; only one can be active. ``timelapse``
+    is an object of ``ScreenRecorder.start`` timelapse settings.
+``stop``
+    stop it; if a GIF was recorded via an intermediate MP4, a conversion
+    job is queued and its id returned.
+``record`` (region, duration, fps, format, output, timelapse)
+    queue a fixed-length recording (+ conversion) as a job.
+``convert`` (src, dst, fps, backend, vfr)
+    queue an MP4 -> GIF conversion job.
+``status`` (id)
+    the active recording and all jobs, or one job.
+``shutdown``
+    stop accepting commands, stop the active recording and finish the
+    queued jobs, then exit.
+
+Jobs from all clients run one at a time, in submission order, on a single
+worker thread, so recordings never compete for the screen or the CPU. Only
+the last ``MAX_FINISHED_JOBS`` finished jobs are kept for ``status``.
+"""
+import itertools
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from typing import Optional
+
+try:
+    from backends import probe
+    from cache import default_cache
+    from converter import convert_mp4_to_gif
+    from library import record_finished
+    from recorder import ScreenRecorder
+    from storage import default_storage
+    from utils import ensure_dirs, scratch_filename, timestamped_filename
+except ImportError:
+    from .backends import probe
+    from .cache import default_cache
+    from .converter import convert_mp4_to_gif
+    from .library import record_finished
+    from .recorder import ScreenRecorder
+    from .storage import default_storage
+    from .utils import ensure_dirs, scratch_filename, timestamped_filename
+
+FORMATS = ('gif', 'webp', 'mp4')
+MAX_FINISHED_JOBS = 100
+
+
+def default_socket_path() -> str:
+    base = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(base, f'screen2gif-{os.getuid()}.sock' if hasattr(os, 'getuid') else 'screen2gif.sock')
+
+
+class RecorderService:
+    """Recording state and the job queue shared by every client connection."""
+
+    def __init__(self):
+        self.recorder = ScreenRecorder()
+        self._lock = threading.Lock()
+        self._active = None  # {'path', 'target', 'fps', 'region', 'started'} of the interactive recording
+        self._ids = itertools.count(1)
+        self.jobs = {}
+        self._jobs_lock = threading.Lock()  # guards self.jobs and the job dicts
+        self._closing = False
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run_jobs, daemon=True)
+        self._worker.start()
+
+    # -- recording helpers ---------------------------------------------------------
+    @staticmethod
+    def _targets(fmt: str, output: Optional[str]):
+        """Return (final output, path to record to) for a requested format."""
+        if fmt not in FORMATS:
+            raise ValueError(f'unknown format: {fmt}')
+        out = output or timestamped_filename('video' if fmt == 'mp4' else 'gif', fmt)
+        if fmt == 'mp4' or ScreenRecorder.can_stream(out):
+            return out, out
+        if fmt == 'gif':
+            return out, scratch_filename('mp4')
+        raise ValueError(f'{fmt} output needs ffmpeg')
+
+    def _finish(self, result: Optional[str], out: str, fps: int, job: dict = None,
+                region=None) -> Optional[str]:
+        if not result:
+            return None
+        if result == out:
+            record_finished(out, region=region, fps=fps, wait=True)
+            default_storage().recording_finished(out)
+            return out
+        stats = {}
+        # the intermediate is deleted after conversion, so caching it would be dead weight
+        ok = convert_mp4_to_gif(result, out, fps=fps, cache=None, vfr=True, stats=stats)
+        if job is not None:
+            self._update(job, stats=stats)
+        if ok:
+            record_finished(out, region=region, fps=fps, source=result, wait=True)
+            default_storage().recording_finished(out, intermediate=result)
+        return out if ok else None
+
+    # -- jobs ----------------------------------------------------------------------
+    def submit(self, kind: str, **args) -> dict:
+        job = {'id': next(self._ids), 'kind': kind, 'args': args, 'state': 'queued',
+               'submitted': time.time(), 'output': None, 'error': None}
+        with self._jobs_lock:
+            self.jobs[job['id']] = job
+        self._queue.put(job)
+        return job
+
+    def _update(self, job: dict, **fields):
+        with self._jobs_lock:
+            job.update(fields)
+
+    def _prune(self):
+        with self._jobs_lock:
+            finished = [i for i, j in self.jobs.items() if j['state'] in ('done', 'failed')]
+            for i in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self.jobs[i]
+
+    def _run_jobs(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._update(job, state='running', started=time.time())
+            try:
+                out = getattr(self, '_job_' + job['kind'])(job, **job['args'])
+                self._update(job, output=out, state='done' if out else 'failed', finished=time.time())
+            except Exception as e:
+                self._update(job, state='failed', error=str(e), finished=time.time())
+            self._prune()
+
+    def _job_record(self, job, region, duration, fps=10, format='gif', output=None, timelapse=None):
+        out, target = self._targets(format, output)
+        with self._lock:
+            if self._active is not None:
+                raise RuntimeError('an interactive recording is active')
+            self.recorder.start(tuple(region), fps=fps, out_path=target, timelapse=timelapse)
+        time.sleep(duration)
+        return self._finish(self.recorder.stop(), out, fps, job, region=region)
+
+    def _job_convert(self, job, src, dst=None, fps=10, backend=None, vfr=True, region=None,
+                     intermediate=False):
+        dst = dst or timestamped_filename('gif', 'gif')
+        stats = {}
+        cache = None if intermediate else default_cache()  # our own recordings are deleted next
+        ok = convert_mp4_to_gif(src, dst, fps=fps, cache=cache, backend=backend, vfr=vfr, stats=stats)
+        self._update(job, stats=stats)
+        if ok:
+            record_finished(dst, region=region, fps=fps, source=src, wait=True)
+            # only MP4s the daemon recorded itself are deleted, never a client's source file
+            default_storage().recording_finished(dst, intermediate=src if intermediate else None)
+        return dst if ok else None
+
+    # -- commands ------------------------------------------------------------------
+    def cmd_ping(self):
+        return {'pid': os.getpid()}
+
+    def cmd_start(self, region, fps=10, format='gif', output=None, timelapse=None):
+        out, target = self._targets(format, output)
+        with self._lock:
+            if self._active is not None or (self.recorder._thread and self.recorder._thread.is_alive()):
+                raise RuntimeError('recorder busy')
+            self.recorder.start(tuple(region), fps=fps, out_path=target, timelapse=timelapse)
+            self._active = {'path': out, 'target': target, 'fps': fps, 'region': list(region),
+                            'started': time.time()}
+        return {'path': out}
+
+    def cmd_stop(self):
+        with self._lock:
+            active, self._active = self._active, None
+            if active is None:
+                raise RuntimeError('not recording')
+            result = self.recorder.stop()
+        reply = {'path': active['path'], 'seconds': time.time() - active['started'],
+                 'capture': self.recorder.last_stats}
+        if not result:
+            raise RuntimeError('no recording produced')
+        if result != active['path']:
+            job = self.submit('convert', src=result, dst=active['path'], fps=active['fps'],
+                              region=active['region'], intermediate=True)
+            reply['job'] = job['id']
+        else:
+            record_finished(result, region=active['region'], fps=active['fps'])
+            default_storage().recording_finished(result)
+        return reply
+
+    def cmd_record(self, region, duration, fps=10, format='gif', output=None, timelapse=None):
+        self._targets(format, output)  # validate before queueing
+        return {'job': self.submit('record', region=region, duration=duration, fps=fps,
+                                   format=format, output=output, timelapse=timelapse)['id']}
+
+    def cmd_convert(self, src, dst=None, fps=10, backend=None, vfr=True):
+        if not os.path.isfile(src):
+            raise FileNotFoundError(src)
+        return {'job': self.submit('convert', src=src, dst=dst, fps=fps, backend=backend, vfr=vfr)['id']}
+
+    def cmd_status(self, id=None):
+        # copies taken under the lock, so the reply is never serialized mid-update
+        with self._jobs_lock:
+            if id is not None:
+                if id not in self.jobs:
+                    raise KeyError(f'no job {id}')
+                return {'job': dict(self.jobs[id])}
+            jobs = [dict(j) for j in self.jobs.values()]
+        active = self._active
+        return {'recording': dict(active) if active else None, 'jobs': jobs}
+
+    def cmd_shutdown(self):
+        # the server stops after replying; close() then finishes the work
+        self._closing = True
+        return {'pending': self._queue.qsize(), 'recording': self._active is not None}
+
+    def close(self, timeout: float = None):
+        """Stop the active recording, run the queued jobs to completion and stop the worker."""
+        self._closing = True
+        if self._active is not None:
+            try:
+                self.cmd_stop()  # queues the conversion of an intermediate MP4
+            except Exception:
+                pass
+        self._queue.put(None)  # after every queued job
+        self._worker.join(timeout)
+
+    def handle(self, request: dict) -> dict:
+        cmd = request.pop('cmd', None)
+        fn = getattr(self, f'cmd_{cmd}', None)
+        if fn is None:
+            return {'ok': False, 'error': f'unknown command: {cmd}'}
+        if self._closing and cmd not in ('ping', 'status', 'shutdown'):
+            return {'ok': False, 'error': 'daemon is shutting down'}
+        try:
+            return dict(fn(**request), ok=True)
+        except Exception as e:
+            return {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            shutdown = False
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError('request must be a JSON object')
+            except ValueError as e:
+                reply = {'ok': False, 'error': f'bad request: {e}'}
+            else:
+                shutdown = request.get('cmd') == 'shutdown'
+                reply = self.server.service.handle(request)
+            self.wfile.write(json.dumps(reply, default=str).encode('utf-8') + b'\n')
+            self.wfile.flush()
+            if shutdown:
+                # serve_forever() is running on another thread; shutdown() waits for it
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path: str = None, warm: bool = True) -> int:
+    """Run the daemon until a ``shutdown`` command (or Ctrl+C)."""
+    if not hasattr(socket, 'AF_UNIX'):
+        print('daemon mode needs Unix domain sockets', file=sys.stderr)
+        return 1
+    socket_path = socket_path or default_socket_path()
+    ensure_dirs()
+    if warm:
+        # fill the backend probe cache now rather than on the first conversion
+        probe()
+    # index the output folders and apply the retention policy in the background
+    default_storage().collect()
+    if os.path.exists(socket_path):
+        # refuse to take over a socket a live daemon is still answering on
+        try:
+            request({'cmd': 'ping'}, socket_path, timeout=1.0)
+            print(f'daemon already running on {socket_path}', file=sys.stderr)
+            return 1
+        except OSError:
+            os.remove(socket_path)
+    server = _Server(socket_path, _Handler)
+    server.service = RecorderService()
+    os.chmod(socket_path, 0o600)
+    print(f'listening on {socket_path}', file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        # the worker is a daemon thread: finish its jobs so no .part files are left behind
+        pending = server.service._queue.qsize()
+        if pending or server.service._active:
+            print(f'finishing {pending} queued job(s)', file=sys.stderr, flush=True)
+        server.service.close()
+        try:
+            os.remove(socket_path)
+        except OSError:
+            pass
+    return 0
+
+
+def request(payload: dict, socket_path: str = None, timeout: float = None) -> dict:
+    """Send one command to a running daemon and return its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(socket_path or default_socket_path())
+        s.sendall(json.dumps(payload).encode('utf-8') + b'\n')
+        buf = b''
+        while not buf.endswith(b'\n'):
+            chunk = s.recv(65536)
+            if not chunk:
+                break
+            buf += chunk
+    if not buf:
+        raise ConnectionError('daemon closed the connection without replying')
+    return json.loads(buf)
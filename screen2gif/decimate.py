@@ -0,0 +1,121 @@
+"""Perceptual near-duplicate frame decimation.
+
+Frames are reduced to small grayscale signatures (block means over
+``block`` x ``block`` cells) a batch at a time with NumPy, and the mean
+absolute difference between consecutive signatures is computed for the whole
+batch at once. A frame is dropped when the accumulated difference since the
+last kept frame stays under ``threshold`` (in 0-255 gray levels); its
+duration is folded into the kept frame so playback timing is unchanged.
+Summing consecutive differences bounds the difference to the last kept
+frame, so slow fades still produce a frame once they add up.
+"""
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 1.5
+DEFAULT_BLOCK = 8
+_BATCH = 16
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def signatures(frames: List[np.ndarray], block: int = DEFAULT_BLOCK) -> np.ndarray:
+    """Return (N, H/block, W/block) float32 block-mean luma signatures."""
+    stack = np.stack(frames)
+    n, h, w = stack.shape[:3]
+    hb, wb = max(1, h // block), max(1, w // block)
+    stack = stack[:, :hb * block, :wb * block, :3]
+    luma = stack.astype(np.float32) @ _LUMA
+    return luma.reshape(n, hb, block, wb, block).mean(axis=(2, 4))
+
+
+class Decimator:
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, block: int = DEFAULT_BLOCK):
+        self.threshold = threshold
+        self.block = block
+        self.frames_in = 0
+        self.removed = 0
+        self.folded_ms = 0.0
+
+    def stats(self) -> dict:
+        return {
+            'frames_in': self.frames_in,
+            'frames_removed': self.removed,
+            'folded_ms': self.folded_ms,
+        }
+
+    def run(self, frames: Iterator[Tuple[np.ndarray, float]]) -> Iterator[Tuple[np.ndarray, float]]:
+        """Filter (frame, duration_ms) pairs, yielding kept frames with merged durations."""
+        pending = None  # [frame, duration_ms] of the last kept frame
+        prev_sig = None
+        acc = 0.0
+        source = iter(frames)
+        while True:
+            batch = [item for _, item in zip(range(_BATCH), source)]
+            if not batch:
+                break
+            self.frames_in += len(batch)
+            sigs = signatures([f for f, _ in batch], self.block)
+            if prev_sig is not None:
+                sigs_all = np.concatenate([prev_sig[None], sigs])
+            else:
+                sigs_all = sigs
+            diffs = np.abs(np.diff(sigs_all, axis=0)).mean(axis=(1, 2))
+            if prev_sig is None:
+                diffs = np.concatenate([[np.inf], diffs])
+            prev_sig = sigs[-1]
+            for (frame, duration_ms), d in zip(batch, diffs):
+                acc += float(d)
+                if pending is not None and acc < self.threshold:
+                    pending[1] += duration_ms
+                    self.removed += 1
+                    self.folded_ms += duration_ms
+                    continue
+                if pending is not None:
+                    yield pending[0], pending[1]
+                pending = [frame, duration_ms]
+                acc = 0.0
+        if pending is not None:
+            yield pending[0], pending[1]
+
+
+class ChangeTrigger:
+    """Decide when a polled frame is worth committing to a timelapse.
+
+    Each poll is reduced to a coarse signature (strided to roughly ``width``
+    pixels across, then block-mean luma). A frame is committed when its mean
+    difference from the last *committed* frame exceeds ``threshold`` or when
+    ``max_interval`` seconds have passed since the last commit, so slow
+    drift and periodic snapshots are both covered.
+    """
+
+    def __init__(self, threshold: float = 4.0, max_interval: float = 60.0, width: int = 160,
+                 block: int = 4):
+        self.threshold = threshold
+        self.max_interval = max_interval
+        self.width = width
+        self.block = block
+        self._sig = None
+        self._last_commit = None
+        self.polls = 0
+        self.commits = 0
+
+    def signature(self, frame: np.ndarray) -> np.ndarray:
+        step = max(1, frame.shape[1] // self.width)
+        return signatures([frame[::step, ::step, :3]], self.block)[0]
+
+    def check(self, frame: np.ndarray, now: float) -> bool:
+        """Return True (and remember ``frame``) if it should be committed."""
+        self.polls += 1
+        sig = self.signature(frame)
+        commit = (self._sig is None
+                  or now - self._last_commit >= self.max_interval
+                  or float(np.abs(sig - self._sig).mean()) > self.threshold)
+        if commit:
+            self._sig = sig
+            self._last_commit = now
+            self.commits += 1
+        return commit
+
+    def stats(self) -> dict:
+        return {'polls': self.polls, 'frames_committed': self.commits}
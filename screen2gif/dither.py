@@ -0,0 +1,80 @@
+"""Ordered (Bayer) and blue-noise dithering as whole-frame NumPy operations.
+
+A dither mode is a fixed threshold map tiled over the frame and added to the
+pixels before palette lookup. Because the map is anchored to screen
+coordinates rather than regenerated per frame, a pixel that does not change
+between frames maps to the same palette index every time: static areas do
+not shimmer and the GIF writer's inter-frame delta boxes stay small.
+"""
+import functools
+
+import numpy as np
+
+DITHER_MODES = ('none', 'bayer2', 'bayer4', 'bayer8', 'bluenoise')
+DEFAULT_STRENGTH = 32.0
+_BLUE_NOISE_SIZE = 64
+
+
+def bayer_matrix(n: int) -> np.ndarray:
+    """Return the n x n Bayer index matrix (n a power of two)."""
+    m = np.zeros((1, 1), dtype=np.int32)
+    while m.shape[0] < n:
+        m = np.block([[4 * m, 4 * m + 2], [4 * m + 3, 4 * m + 1]])
+    return m
+
+
+@functools.lru_cache(maxsize=1)
+def blue_noise(size: int = _BLUE_NOISE_SIZE) -> np.ndarray:
+    """Rank-equalized high-pass noise tile: a cheap blue-noise approximation.
+
+    Seeded white noise is filtered in the frequency domain to suppress low
+    frequencies, then ranked so thresholds are uniformly distributed. The
+    result is deterministic, so the map is identical across runs.
+    """
+    rng = np.random.default_rng(0x5C2F)
+    white = rng.random((size, size))
+    fy = np.fft.fftfreq(size)[:, None]
+    fx = np.fft.fftfreq(size)[None, :]
+    radius = np.sqrt(fx * fx + fy * fy)
+    highpass = np.clip(radius / 0.5, 0.0, 1.0) ** 2
+    filtered = np.real(np.fft.ifft2(np.fft.fft2(white) * highpass))
+    ranks = np.empty(size * size, dtype=np.int32)
+    ranks[np.argsort(filtered, axis=None)] = np.arange(size * size)
+    return ranks.reshape(size, size)
+
+
+def _tile(mode: str) -> np.ndarray:
+    """Normalized threshold tile with values in (-0.5, 0.5)."""
+    if mode.startswith('bayer'):
+        n = int(mode[5:])
+        m = bayer_matrix(n)
+    elif mode == 'bluenoise':
+        m = blue_noise()
+    else:
+        raise ValueError(f'unknown dither mode: {mode}')
+    return (m.astype(np.float32) + 0.5) / m.size - 0.5
+
+
+@functools.lru_cache(maxsize=8)
+def threshold_map(mode: str, height: int, width: int, strength: float = DEFAULT_STRENGTH):
+    """Return an (H, W, 1) int16 offset map for ``mode``, or None for 'none'."""
+    if mode in (None, 'none'):
+        return None
+    tile = _tile(mode)
+    th, tw = tile.shape
+    reps = (-(-height // th), -(-width // tw))
+    full = np.tile(tile, reps)[:height, :width]
+    offsets = np.rint(full * strength).astype(np.int16)
+    offsets.setflags(write=False)
+    return offsets[:, :, None]
+
+
+def apply(frame: np.ndarray, mode: str, strength: float = DEFAULT_STRENGTH) -> np.ndarray:
+    """Return ``frame`` (uint8 RGB) with the dither offsets for ``mode`` applied."""
+    offsets = threshold_map(mode, frame.shape[0], frame.shape[1], float(strength))
+    if offsets is None:
+        return frame
+    out = frame.astype(np.int16)
+    out += offsets
+    np.clip(out, 0, 255, out=out)
+    return out.astype(np.uint8)
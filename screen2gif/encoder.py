@@ -0,0 +1,298 @@
+"""In-process MP4 -> GIF encoder built on NumPy.
+
+Decodes with OpenCV (imageio as fallback), builds one global palette from a
+handful of frames sampled across the recording, maps every frame to that
+palette through a precomputed RGB lookup table and streams the result into
+``GifWriter``. Memory use is bounded by a few frames regardless of length.
+Optional ordered/blue-noise dithering is applied before the palette lookup.
+
+Frame timing comes from the recorder's timestamp sidecar when present (the
+container's timestamps otherwise), so dropped or late frames keep their real
+on-screen duration instead of being stretched to a constant rate.
+"""
+import itertools
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+try:
+    import dither as _dither
+    from decimate import Decimator
+    from gif_writer import GifWriter, TRANSPARENT_INDEX
+    from sidecar import frame_range, keyframe_at_or_before, load_sidecar
+except ImportError:
+    from . import dither as _dither
+    from .decimate import Decimator
+    from .gif_writer import GifWriter, TRANSPARENT_INDEX
+    from .sidecar import frame_range, keyframe_at_or_before, load_sidecar
+
+PALETTE_SAMPLES = 16
+_LUT_BITS = 5
+
+
+def probe_video(path: str) -> Tuple[float, int]:
+    """Return (fps, frame_count) of a video; frame_count may be 0 if unknown."""
+    try:
+        import cv2
+        cap = cv2.VideoCapture(path)
+        try:
+            return float(cap.get(cv2.CAP_PROP_FPS) or 0.0), int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        finally:
+            cap.release()
+    except ImportError:
+        import imageio
+        meta = imageio.get_reader(path).get_meta_data()
+        fps, n = float(meta.get('fps') or 0.0), meta.get('nframes') or 0
+        if n == float('inf'):  # the ffmpeg plugin does not count frames
+            n = round(fps * float(meta.get('duration') or 0.0))
+        return fps, int(n)
+
+
+def _crop(frame: np.ndarray, crop) -> np.ndarray:
+    if crop is None:
+        return frame
+    x, y, w, h = (int(v) for v in crop)
+    return frame[max(0, y):y + h, max(0, x):x + w]
+
+
+def frame_window(path: str, start: float = None, end: float = None, index: dict = None) -> Tuple[int, Optional[int]]:
+    """Map a trim range in seconds to [first, stop) frame indices.
+
+    Uses the sidecar index when there is one and the container frame rate
+    otherwise; ``stop`` is None when the range runs to the end.
+    """
+    if start is None and end is None:
+        return 0, None
+    if index is not None:
+        return frame_range(index, start, end)
+    fps = probe_video(path)[0] or 10.0
+    first = int(round(start * fps)) if start else 0
+    stop = int(round(end * fps)) if end is not None else None
+    return first, stop
+
+
+def read_frames(path: str, use_sidecar: bool = True, decoder: str = None, start: float = None,
+                end: float = None, crop=None) -> Iterator[Tuple[float, np.ndarray]]:
+    """Yield (timestamp_seconds, rgb_frame) for the frames of ``path``.
+
+    Timestamps come from the capture sidecar when one exists and otherwise
+    from the container, and are rebased so the first yielded frame is at 0.
+    ``start``/``end`` (seconds) trim the range: OpenCV seeks straight to the
+    keyframe before ``start`` and only decodes forward from there. ``crop``
+    is an (x, y, w, h) rect applied before colour conversion. ``decoder``
+    forces 'cv2' or 'imageio'; by default OpenCV is used when installed.
+    """
+    sc = load_sidecar(path) if use_sidecar else None
+    captured = sc['timestamps'] if sc else []
+    first, stop = frame_window(path, start, end, sc)
+    t_base = None
+    cv2 = None
+    if decoder != 'imageio':
+        try:
+            import cv2
+        except ImportError:
+            if decoder == 'cv2':
+                raise
+    if cv2 is not None:
+        cap = cv2.VideoCapture(path)
+        i = first
+        try:
+            if first and sc:
+                kf = keyframe_at_or_before(sc, first)
+                cap.set(cv2.CAP_PROP_POS_FRAMES, kf)
+                # decode without colour conversion up to the first wanted frame
+                for _ in range(first - kf):
+                    cap.grab()
+            elif first:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+            while stop is None or i < stop:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                t = captured[i] if i < len(captured) else cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                if t_base is None:
+                    t_base = t
+                yield t - t_base, cv2.cvtColor(_crop(frame, crop), cv2.COLOR_BGR2RGB)
+                i += 1
+        finally:
+            cap.release()
+        return
+    import imageio
+    reader = imageio.get_reader(path)
+    fps = float(reader.get_meta_data().get('fps') or 10.0)
+    for i, im in enumerate(reader):
+        if i < first:
+            continue
+        if stop is not None and i >= stop:
+            break
+        t = captured[i] if i < len(captured) else i / fps
+        if t_base is None:
+            t_base = t
+        yield t - t_base, _crop(np.asarray(im)[..., :3], crop)
+
+
+def sample_frames(path: str, count: int = PALETTE_SAMPLES, start: float = None, end: float = None,
+                  crop=None) -> List[np.ndarray]:
+    """Return up to ``count`` RGB frames spread evenly over the (trimmed) video."""
+    _, total = probe_video(path)
+    first, stop = frame_window(path, start, end, load_sidecar(path))
+    if stop is None:
+        stop = total
+    elif total > 0:
+        stop = min(stop, total)
+    try:
+        import cv2
+    except ImportError:
+        cv2 = None
+    if cv2 is None or not stop:
+        frames = [f for _, f in read_frames(path, start=start, end=end, crop=crop)]
+        step = max(1, len(frames) // count)
+        return frames[::step][:count]
+    cap = cv2.VideoCapture(path)
+    out = []
+    try:
+        for idx in np.linspace(first, stop - 1, num=max(0, min(count, stop - first))).astype(int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+            ok, frame = cap.read()
+            if ok:
+                out.append(cv2.cvtColor(_crop(frame, crop), cv2.COLOR_BGR2RGB))
+    finally:
+        cap.release()
+    return out
+
+
+def build_palette(frames: List[np.ndarray], colors: int = TRANSPARENT_INDEX) -> np.ndarray:
+    """Median-cut palette over a montage of (downscaled) sample frames."""
+    tiles = []
+    for f in frames:
+        step = max(1, int(np.ceil(max(f.shape[:2]) / 256)))
+        tiles.append(f[::step, ::step, :3].reshape(-1, 3))
+    pixels = np.concatenate(tiles)[None, :, :]
+    im = Image.fromarray(np.ascontiguousarray(pixels), 'RGB')
+    q = im.quantize(colors=colors, method=Image.Quantize.MEDIANCUT)
+    pal = np.array(q.getpalette()[:colors * 3], dtype=np.uint8).reshape(-1, 3)
+    return pal
+
+
+def palette_lut(palette: np.ndarray) -> np.ndarray:
+    """Nearest-palette-index table over a 5-bit-per-channel RGB cube."""
+    n = 1 << _LUT_BITS
+    centers = (np.arange(n, dtype=np.int32) << (8 - _LUT_BITS)) + (1 << (7 - _LUT_BITS))
+    pal = palette.astype(np.int32)
+    lut = np.empty((n, n, n), dtype=np.uint8)
+    g, b = np.meshgrid(centers, centers, indexing='ij')
+    gb = np.stack([g.ravel(), b.ravel()], axis=1)
+    for ri, r in enumerate(centers):
+        # squared distance from every (r, g, b) cell in this slab to every palette entry
+        d = (r - pal[None, :, 0]) ** 2 \
+            + (gb[:, None, 0] - pal[None, :, 1]) ** 2 \
+            + (gb[:, None, 1] - pal[None, :, 2]) ** 2
+        lut[ri] = d.argmin(axis=1).reshape(n, n)
+    return lut
+
+
+def quantize(frame: np.ndarray, lut: np.ndarray) -> np.ndarray:
+    """Map an RGB frame to palette indices via ``lut``."""
+    shift = 8 - _LUT_BITS
+    r = frame[..., 0] >> shift
+    g = frame[..., 1] >> shift
+    b = frame[..., 2] >> shift
+    flat = (r.astype(np.uint16) << (2 * _LUT_BITS)) | (g.astype(np.uint16) << _LUT_BITS) | b
+    return lut.ravel()[flat]
+
+
+def resample(frames: Iterator[Tuple[float, np.ndarray]], fps: float) -> Iterator[Tuple[np.ndarray, float]]:
+    """Resample timestamped frames to ``fps``; yields (frame, duration_ms)."""
+    slot_ms = 1000.0 / fps
+    pending = None
+    pending_slot = None
+    for t, frame in frames:
+        slot = int(np.floor(t * fps + 1e-6))
+        if pending is not None and slot <= pending_slot:
+            continue
+        if pending is not None:
+            yield pending, (slot - pending_slot) * slot_ms
+        pending, pending_slot = frame, slot
+    if pending is not None:
+        yield pending, slot_ms
+
+
+def native_timing(frames: Iterator[Tuple[float, np.ndarray]], fps: float) -> Iterator[Tuple[np.ndarray, float]]:
+    """Keep every frame with its own captured duration; yields (frame, duration_ms).
+
+    The last frame, which has no successor, is shown for the median interval
+    (or ``1/fps`` for single-frame input).
+    """
+    pending = None
+    intervals = []
+    for t, frame in frames:
+        if pending is not None:
+            dt = max(0.0, t - pending[0]) * 1000.0
+            intervals.append(dt)
+            yield pending[1], dt
+        pending = (t, frame)
+    if pending is not None:
+        yield pending[1], float(np.median(intervals)) if intervals else 1000.0 / fps
+
+
+def encode_gif(src_path: str, gif_path: str, fps: int = 10, dither: str = 'none',
+               dither_strength: float = _dither.DEFAULT_STRENGTH, vfr: bool = False,
+               decimate: float = None, start: float = None, end: float = None, crop=None,
+               stats: dict = None) -> bool:
+    """Convert ``src_path`` to an animated GIF at ``gif_path``.
+
+    ``dither`` is one of ``dither.DITHER_MODES``. With ``vfr`` every captured
+    frame keeps its own delay instead of being resampled to ``fps``;
+    consecutive identical frames are merged into one longer frame either way.
+    ``decimate`` drops near-duplicate frames whose perceptual difference is
+    under the given threshold (see ``decimate.Decimator``). If ``stats`` is a
+    dict it is filled with frame counts and timings for the run. ``start``/
+    ``end`` trim the recording (seconds) and ``crop`` is an (x, y, w, h) rect;
+    both are applied before quantization.
+    """
+    samples = sample_frames(src_path, start=start, end=end, crop=crop)
+    if not samples:
+        return False
+    timing = native_timing if vfr else resample
+    frames = read_frames(src_path, start=start, end=end, crop=crop)
+    return encode_frames(timing(frames, fps), gif_path, build_palette(samples),
+                         dither=dither, dither_strength=dither_strength, decimate=decimate, stats=stats)
+
+
+def encode_frames(frames: Iterator[Tuple[np.ndarray, float]], gif_path: str, palette: np.ndarray,
+                  dither: str = 'none', dither_strength: float = _dither.DEFAULT_STRENGTH,
+                  decimate: float = None, stats: dict = None) -> bool:
+    """Stream (rgb_frame, duration_ms) pairs into a GIF using ``palette``."""
+    if dither not in _dither.DITHER_MODES:
+        raise ValueError(f'unknown dither mode: {dither}')
+    lut = palette_lut(palette)
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        return False
+    h, w = first[0].shape[:2]
+    with GifWriter(gif_path, (w, h), palette) as writer:
+        frames = itertools.chain([first], frames)
+        decimator = Decimator(decimate) if decimate else None
+        if decimator is not None:
+            frames = decimator.run(frames)
+        encoded = 0
+        encode_s = 0.0
+        for frame, duration_ms in frames:
+            t0 = time.perf_counter()
+            frame = _dither.apply(frame, dither, dither_strength)
+            writer.write(quantize(frame, lut), duration_ms)
+            encode_s += time.perf_counter() - t0
+            encoded += 1
+    if stats is not None:
+        stats['frames_encoded'] = encoded
+        stats['frames_written'] = writer.frames_written
+        stats['frames_merged'] = writer.frames_merged
+        stats['encode_s'] = encode_s
+        if decimator is not None:
+            stats.update(decimator.stats())
+            # encode time the dropped frames would have cost at the measured rate
+            stats['encode_s_saved'] = decimator.removed * (encode_s / encoded) if encoded else 0.0
+    return writer.frames_written > 0
@@ -0,0 +1,137 @@
+"""Frame buffer with a RAM budget that spills to memory-mapped files.
+
+Frames are kept in memory until ``ram_budget`` bytes are used; later frames go
+to fixed-size ``np.memmap`` chunk files on disk. Iteration and indexing return
+frames from either tier, so palette building and encoding can stream over a
+recording far larger than physical memory. Spill files are removed on
+``close()``.
+"""
+import os
+import tempfile
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    from utils import _is_tmpfs
+except ImportError:
+    from .utils import _is_tmpfs
+
+# overridable per machine with SCREEN2GIF_RAM_BUDGET_MB
+DEFAULT_RAM_BUDGET = int(os.environ.get('SCREEN2GIF_RAM_BUDGET_MB', '256')) * 1024 * 1024
+_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def default_spill_dir() -> str:
+    """Disk directory for spill chunks: SCREEN2GIF_SPILL_DIR, else the temp dir
+    unless it is a tmpfs (spilling there would land back in RAM), else cache/spill."""
+    configured = os.environ.get('SCREEN2GIF_SPILL_DIR')
+    if configured:
+        return configured
+    tmp = tempfile.gettempdir()
+    if not _is_tmpfs(tmp):
+        return tmp
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'spill')
+
+
+class FrameStore:
+    def __init__(self, ram_budget: int = None, spill_dir: Optional[str] = None):
+        self.ram_budget = DEFAULT_RAM_BUDGET if ram_budget is None else ram_budget
+        self.spill_dir = spill_dir or default_spill_dir()
+        self._ram: List[np.ndarray] = []
+        self._ram_bytes = 0
+        self._chunks: List[np.memmap] = []
+        self._chunk_paths: List[str] = []
+        self._chunk_frames = 0
+        self._spilled = 0
+        self._shape = None
+        self._dtype = None
+
+    def __len__(self) -> int:
+        return len(self._ram) + self._spilled
+
+    @property
+    def ram_bytes(self) -> int:
+        return self._ram_bytes
+
+    @property
+    def disk_bytes(self) -> int:
+        return sum(c.nbytes for c in self._chunks)
+
+    def append(self, frame: np.ndarray):
+        frame = np.asarray(frame)
+        if self._shape is None:
+            self._shape, self._dtype = frame.shape, frame.dtype
+        elif frame.shape != self._shape or frame.dtype != self._dtype:
+            raise ValueError(f'frame shape {frame.shape} does not match store shape {self._shape}')
+        if not self._spilled and self._ram_bytes + frame.nbytes <= self.ram_budget:
+            self._ram.append(np.array(frame, copy=True))
+            self._ram_bytes += frame.nbytes
+            return
+        # once spilling has started keep frames in order on disk
+        slot = self._spilled % max(1, self._chunk_frames) if self._chunks else 0
+        if not self._chunks or slot == 0:
+            self._new_chunk(frame.nbytes)
+            slot = 0
+        self._chunks[-1][slot] = frame
+        self._spilled += 1
+
+    def _new_chunk(self, frame_bytes: int):
+        if self._chunks:
+            # Reopen the full chunk read-only so its written pages are no
+            # longer part of our mapping and count against RSS.
+            full = self._chunks[-1]
+            full.flush()
+            self._chunks[-1] = np.memmap(self._chunk_paths[-1], dtype=self._dtype, mode='r', shape=full.shape)
+            del full
+        self._chunk_frames = max(1, _CHUNK_BYTES // frame_bytes)
+        os.makedirs(self.spill_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix='s2g_frames_', suffix='.raw', dir=self.spill_dir)
+        os.close(fd)
+        mm = np.memmap(path, dtype=self._dtype, mode='w+', shape=(self._chunk_frames,) + tuple(self._shape))
+        self._chunks.append(mm)
+        self._chunk_paths.append(path)
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        if i < len(self._ram):
+            return self._ram[i]
+        j = i - len(self._ram)
+        return self._chunks[j // self._chunk_frames][j % self._chunk_frames]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def sample(self, count: int) -> List[np.ndarray]:
+        """Return up to ``count`` frames spread evenly over the store."""
+        if not len(self):
+            return []
+        idx = np.linspace(0, len(self) - 1, num=min(count, len(self))).astype(int)
+        return [self[int(i)] for i in idx]
+
+    def close(self):
+        self._ram = []
+        self._ram_bytes = 0
+        for mm in self._chunks:
+            try:
+                mm._mmap.close()
+            except Exception:
+                pass
+        self._chunks = []
+        for p in self._chunk_paths:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+        self._chunk_paths = []
+        self._spilled = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,166 @@
+"""Streaming GIF89a writer with a global palette and optional local ones.
+
+Frames are palette-indexed ``uint8`` arrays and are written to disk as soon as
+they arrive, so memory use does not grow with the length of the animation.
+Only the bounding box of pixels that changed since the previous frame is
+stored, and unchanged pixels inside that box are written as the reserved
+transparent index, which keeps LZW runs long for mostly static recordings.
+Consecutive identical frames are merged into one frame whose delay is the
+sum of theirs, so the writer holds back one frame until the next differs.
+
+``set_palette`` switches later frames to a local colour table, for long
+recordings whose colours drift away from the palette they started with. The
+first frame after a switch is written in full, because indices from the old
+palette no longer mean the same colours.
+
+Pillow is used to LZW-compress each sub-image; its single-frame output is
+parsed and only the image data block is copied into our stream.
+"""
+import io
+import struct
+
+import numpy as np
+from PIL import Image
+
+TRANSPARENT_INDEX = 255
+
+
+def _image_data(indexed: np.ndarray, palette_bytes: bytes) -> bytes:
+    """Return the LZW image data (code size byte + sub-blocks) for ``indexed``."""
+    im = Image.fromarray(indexed, 'P')
+    im.putpalette(palette_bytes)
+    buf = io.BytesIO()
+    im.save(buf, 'GIF', optimize=False, interlace=False)  # our descriptor is not interlaced
+    data = buf.getvalue()
+    pos = 13
+    flags = data[10]
+    if flags & 0x80:
+        pos += 3 * (2 << (flags & 0x07))
+    while pos < len(data):
+        block = data[pos]
+        if block == 0x21:  # extension: label + sub-blocks
+            pos += 2
+            while data[pos]:
+                pos += data[pos] + 1
+            pos += 1
+        elif block == 0x2C:  # image descriptor
+            packed = data[pos + 9]
+            pos += 10
+            if packed & 0x80:
+                pos += 3 * (2 << (packed & 0x07))
+            start = pos
+            pos += 1  # LZW minimum code size
+            while data[pos]:
+                pos += data[pos] + 1
+            return data[start:pos + 1]
+        else:
+            break
+    raise ValueError('no image data in encoded frame')
+
+
+class GifWriter:
+    def __init__(self, path: str, size, palette: np.ndarray, loop: int = 0):
+        """``palette`` is an (N, 3) uint8 array with N <= 255; index 255 is
+        reserved for transparency."""
+        self.path = path
+        self.width, self.height = size
+        self._palette_bytes = self._table(palette)
+        self._local = None  # colour table bytes after set_palette, None = global
+        self._prev = None
+        self._pending = None
+        self._elapsed_ms = 0.0
+        self._emitted_cs = 0
+        self.frames_written = 0
+        self.frames_merged = 0
+        self.palettes = 1
+        self._f = open(path, 'wb')
+        self._f.write(b'GIF89a')
+        self._f.write(struct.pack('<HHBBB', self.width, self.height, 0xF7, 0, 0))
+        self._f.write(self._palette_bytes)
+        # NETSCAPE2.0 application extension: loop count
+        self._f.write(b'\x21\xFF\x0BNETSCAPE2.0\x03\x01' + struct.pack('<H', loop) + b'\x00')
+
+    def _delay_cs(self, duration_ms: float) -> int:
+        # Track the exact elapsed time so centisecond rounding never drifts.
+        self._elapsed_ms += duration_ms
+        target = int(round(self._elapsed_ms / 10.0))
+        delay = max(2, target - self._emitted_cs)  # browsers clamp delays < 2cs to 10cs
+        self._emitted_cs += delay
+        return delay
+
+    @staticmethod
+    def _table(palette: np.ndarray) -> bytes:
+        pal = np.zeros((256, 3), dtype=np.uint8)
+        pal[:min(len(palette), TRANSPARENT_INDEX)] = palette[:TRANSPARENT_INDEX]
+        return pal.tobytes()
+
+    def set_palette(self, palette: np.ndarray):
+        """Index frames written from now on into ``palette`` (same layout as in ``__init__``)."""
+        table = self._table(palette)
+        if table == (self._local or self._palette_bytes):
+            return
+        self._flush()  # the held-back frame still uses the old palette
+        self._local = None if table == self._palette_bytes else table
+        self._prev = None
+        self.palettes += 1
+
+    def write(self, indexed: np.ndarray, duration_ms: float):
+        """Append one palette-indexed frame shown for ``duration_ms``."""
+        if self._pending is not None and np.array_equal(indexed, self._pending[0]):
+            self._pending[1] += duration_ms
+            self.frames_merged += 1
+            return
+        self._flush()
+        self._pending = [indexed, duration_ms]
+
+    def _flush(self):
+        if self._pending is not None:
+            self._emit(*self._pending)
+            self._pending = None
+
+    def _emit(self, indexed: np.ndarray, duration_ms: float):
+        delay = self._delay_cs(duration_ms)
+        if self._prev is None:
+            left, top = 0, 0
+            sub = indexed
+            transparent = False
+        else:
+            changed = indexed != self._prev
+            rows = np.flatnonzero(changed.any(axis=1))
+            cols = np.flatnonzero(changed.any(axis=0))
+            if rows.size == 0:
+                # nothing changed: a single transparent pixel keeps the timing
+                left, top = 0, 0
+                sub = np.full((1, 1), TRANSPARENT_INDEX, dtype=np.uint8)
+            else:
+                top, bottom = int(rows[0]), int(rows[-1]) + 1
+                left, right = int(cols[0]), int(cols[-1]) + 1
+                sub = np.where(changed[top:bottom, left:right],
+                               indexed[top:bottom, left:right], TRANSPARENT_INDEX).astype(np.uint8)
+            transparent = True
+        sub = np.ascontiguousarray(sub)
+        f = self._f
+        # graphic control extension: disposal 1 (leave in place), optional transparency
+        packed = (1 << 2) | (1 if transparent else 0)
+        f.write(b'\x21\xF9\x04' + struct.pack('<BHB', packed, delay, TRANSPARENT_INDEX) + b'\x00')
+        table = self._local or self._palette_bytes
+        f.write(b'\x2C' + struct.pack('<HHHHB', left, top, sub.shape[1], sub.shape[0], 0x87 if self._local else 0))
+        if self._local:
+            f.write(self._local)
+        f.write(_image_data(sub, table))
+        self._prev = indexed
+        self.frames_written += 1
+
+    def close(self):
+        if self._f is None:
+            return
+        self._flush()
+        self._f.write(b'\x3B')
+        self._f.close()
+        self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
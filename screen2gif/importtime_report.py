@@ -0,0 +1,63 @@
+"""Summarize ``python -X importtime`` for a module of the app.
+
+Usage:
+    python importtime_report.py            # report for main.py
+    python importtime_report.py cli --top 15
+
+Runs the import in a fresh interpreter, then prints the total and the
+slowest direct imports by cumulative time (one level below the top, so
+nested imports are not double counted) and the slowest modules by self
+time.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import List, Tuple
+
+_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def measure(module: str = 'main') -> List[Tuple[str, int, int, int]]:
+    """Return (name, self_us, cumulative_us, depth) for every import of ``module``."""
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                          capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), (len(m.group(3)) - 1) // 2))
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'import failed')
+    return rows
+
+
+def report(module: str = 'main', top: int = 10) -> str:
+    rows = measure(module)
+    total = sum(r[1] for r in rows)
+    target = next((r for r in rows if r[0] == module), None)
+    lines = [f'{module}: {len(rows)} modules, {total / 1000:.1f} ms total self time'
+             + (f', {target[2] / 1000:.1f} ms cumulative for {module}' if target else '')]
+    lines.append('slowest direct imports (cumulative):')
+    for name, _, cum, _ in sorted((r for r in rows if r[3] == 1), key=lambda r: -r[2])[:top]:
+        lines.append(f'  {cum / 1000:8.1f} ms  {name}')
+    lines.append('slowest modules (self):')
+    for name, own, _, _ in sorted(rows, key=lambda r: -r[1])[:top]:
+        lines.append(f'  {own / 1000:8.1f} ms  {name}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import-time report for a screen2gif module')
+    parser.add_argument('module', nargs='?', default='main')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+    print(report(args.module, args.top))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Deferred imports for the GUI startup path.
+
+``import_module`` loads a sibling module whether the app runs as flat
+scripts or as the ``screen2gif`` package. ``LazyObject`` builds its target on
+first attribute access, so module-level wiring in ``main.py`` does not pull
+in cv2/numpy/mss before the launcher window is up, and ``prefetch`` imports
+modules on a background thread once the window has painted so they are warm
+by the time the user presses record.
+"""
+import importlib
+import threading
+from typing import Callable, Iterable
+
+
+def import_module(name: str):
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        if not __package__:
+            raise
+        return importlib.import_module(f'.{name}', __package__)
+
+
+class LazyObject:
+    def __init__(self, factory: Callable):
+        object.__setattr__(self, '_lazy_factory', factory)
+        object.__setattr__(self, '_lazy_obj', None)
+        object.__setattr__(self, '_lazy_lock', threading.Lock())
+
+    def _lazy_get(self):
+        obj = object.__getattribute__(self, '_lazy_obj')
+        if obj is None:
+            with object.__getattribute__(self, '_lazy_lock'):
+                obj = object.__getattribute__(self, '_lazy_obj')
+                if obj is None:
+                    obj = object.__getattribute__(self, '_lazy_factory')()
+                    object.__setattr__(self, '_lazy_obj', obj)
+        return obj
+
+    def _lazy_loaded(self) -> bool:
+        return object.__getattribute__(self, '_lazy_obj') is not None
+
+    def __getattr__(self, name):
+        return getattr(self._lazy_get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._lazy_get(), name, value)
+
+
+def prefetch(names: Iterable[str]) -> threading.Thread:
+    """Import ``names`` on a daemon thread; import errors are left for the real use to report."""
+    def _run():
+        for name in names:
+            try:
+                import_module(name)
+            except Exception:
+                pass
+
+    t = threading.Thread(target=_run, name='prefetch', daemon=True)
+    t.start()
+    return t
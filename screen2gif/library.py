@@ -0,0 +1,296 @@
+"""SQLite index of finished recordings.
+
+Usage:
+    python library.py rebuild                 # rescan video/ and gif/
+    python library.py list --since 2024-05-01 --min-duration 10 --order bytes
+
+Each recording gets one row with its path, capture region, fps, duration,
+frame count, pixel size, file size, content hash and the path of its
+preview thumbnail. Rows are added as recordings finish (GUI, CLI and
+daemon), so queries by date, size or duration are index lookups that never
+open the media files. ``rebuild`` rescans the output folders, re-reading
+only files whose size or mtime changed and dropping rows for deleted files.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+try:
+    from cache import hash_file
+except ImportError:
+    from .cache import hash_file
+
+DEFAULT_DB = os.path.join(os.path.dirname(__file__), 'library.db')
+MEDIA_EXTENSIONS = ('.gif', '.mp4', '.webp')
+ORDERS = {'created': 'created', 'bytes': 'bytes', 'duration': 'duration', 'frames': 'frames'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    created REAL NOT NULL,
+    mtime REAL NOT NULL,
+    bytes INTEGER NOT NULL,
+    region TEXT,
+    fps REAL,
+    duration REAL,
+    frames INTEGER,
+    width INTEGER,
+    height INTEGER,
+    content_hash TEXT,
+    thumbnail TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS recordings_created ON recordings (created);
+CREATE INDEX IF NOT EXISTS recordings_bytes ON recordings (bytes);
+CREATE INDEX IF NOT EXISTS recordings_duration ON recordings (duration);
+CREATE INDEX IF NOT EXISTS recordings_hash ON recordings (content_hash);
+"""
+
+
+def probe_media(path: str) -> dict:
+    """Read fps, duration, frame count and size from a GIF/WebP or video file."""
+    info = {}
+    if path.lower().endswith(('.gif', '.webp')):
+        from PIL import Image
+        with Image.open(path) as im:
+            info['width'], info['height'] = im.size
+            n = getattr(im, 'n_frames', 1)
+            total_ms = 0
+            for i in range(n):
+                im.seek(i)
+                total_ms += im.info.get('duration', 0) or 0
+            info['frames'] = n
+            info['duration'] = total_ms / 1000.0
+            if total_ms:
+                info['fps'] = n * 1000.0 / total_ms
+        return info
+    import cv2
+    cap = cv2.VideoCapture(path)
+    try:
+        fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        info.update(width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0),
+                    height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0),
+                    frames=frames, fps=fps or None)
+    finally:
+        cap.release()
+    # the capture sidecar has the real duration for recordings with dropped frames
+    try:
+        from sidecar import load_sidecar
+    except ImportError:
+        from .sidecar import load_sidecar
+    sc = load_sidecar(path)
+    if sc and sc['timestamps']:
+        ts = sc['timestamps']
+        info['duration'] = ts[-1] + (1.0 / sc['fps'] if sc.get('fps') else 0.0)
+    elif fps:
+        info['duration'] = frames / fps
+    return info
+
+
+def _thumbnail_for(path: str) -> Optional[str]:
+    """Render (or reuse) the preview thumbnail; None if the file has no decodable frame."""
+    try:
+        from preview import render_thumbnail
+    except ImportError:
+        from .preview import render_thumbnail
+    try:
+        return render_thumbnail(path)
+    except Exception:
+        return None
+
+
+class Library:
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or DEFAULT_DB
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # one short-lived connection per call, so any thread may use the library
+        db = sqlite3.connect(self.db_path, timeout=10)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def add(self, path: str, region=None, fps: float = None, source: str = None,
+            created: float = None) -> dict:
+        """Index (or re-index) ``path``; explicit ``region``/``fps``/``source`` override probed values."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        row = {'path': path, 'kind': os.path.splitext(path)[1].lstrip('.').lower(),
+               'created': created or st.st_mtime, 'mtime': st.st_mtime, 'bytes': st.st_size,
+               'region': None, 'fps': None, 'duration': None, 'frames': None, 'width': None,
+               'height': None, 'content_hash': hash_file(path), 'thumbnail': _thumbnail_for(path),
+               'source': os.path.abspath(source) if source else None}
+        try:
+            row.update(probe_media(path))
+        except Exception:
+            pass
+        if region is not None:
+            row['region'] = json.dumps(list(region))
+        if fps:
+            row['fps'] = fps
+        cols = list(row)
+        with self._connect() as db:
+            old = db.execute('SELECT created, region, source FROM recordings WHERE path = ?', (path,)).fetchone()
+            if old is not None:
+                # keep what only the recorder knew when re-indexing
+                row['created'] = old['created'] if created is None else row['created']
+                row['region'] = row['region'] or old['region']
+                row['source'] = row['source'] or old['source']
+            db.execute(f"INSERT OR REPLACE INTO recordings ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                       [row[c] for c in cols])
+        return row
+
+    def add_async(self, path: str, **meta) -> threading.Thread:
+        """``add`` on a daemon thread (hashing a large file must not block a GUI)."""
+        def _run():
+            try:
+                self.add(path, **meta)
+            except Exception:
+                pass
+        t = threading.Thread(target=_run, name='library-add', daemon=True)
+        t.start()
+        return t
+
+    def remove(self, path: str):
+        with self._connect() as db:
+            db.execute('DELETE FROM recordings WHERE path = ?', (os.path.abspath(path),))
+
+    def get(self, path: str) -> Optional[dict]:
+        with self._connect() as db:
+            r = db.execute('SELECT * FROM recordings WHERE path = ?', (os.path.abspath(path),)).fetchone()
+        return dict(r) if r else None
+
+    def query(self, since: float = None, until: float = None, min_bytes: int = None, max_bytes: int = None,
+              min_duration: float = None, max_duration: float = None, kind: str = None,
+              order: str = 'created', descending: bool = True, limit: int = None) -> List[dict]:
+        where, args = [], []
+        for col, op, val in (('created', '>=', since), ('created', '<', until),
+                             ('bytes', '>=', min_bytes), ('bytes', '<=', max_bytes),
+                             ('duration', '>=', min_duration), ('duration', '<=', max_duration),
+                             ('kind', '=', kind)):
+            if val is not None:
+                where.append(f'{col} {op} ?')
+                args.append(val)
+        sql = 'SELECT * FROM recordings'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += f" ORDER BY {ORDERS.get(order, 'created')} {'DESC' if descending else 'ASC'}"
+        if limit:
+            sql += ' LIMIT ?'
+            args.append(int(limit))
+        with self._connect() as db:
+            return [dict(r) for r in db.execute(sql, args)]
+
+    def rebuild(self, folders: Iterable[str] = None) -> dict:
+        """Rescan ``folders`` (default video/ and gif/): add new or changed files, drop missing ones."""
+        base = os.path.dirname(__file__)
+        folders = list(folders or (os.path.join(base, 'video'), os.path.join(base, 'gif')))
+        with self._connect() as db:
+            # rows without a thumbnail are redone as if changed
+            known = {r['path']: (r['mtime'], r['bytes']) if r['thumbnail'] else None
+                     for r in db.execute('SELECT path, mtime, bytes, thumbnail FROM recordings')}
+        seen, added, updated = set(), 0, 0
+        for folder in folders:
+            if not os.path.isdir(folder):
+                continue
+            for name in sorted(os.listdir(folder)):
+                if not name.lower().endswith(MEDIA_EXTENSIONS) or '.part.' in name:
+                    continue
+                path = os.path.abspath(os.path.join(folder, name))
+                seen.add(path)
+                st = os.stat(path)
+                if known.get(path) == (st.st_mtime, st.st_size):
+                    continue
+                try:
+                    self.add(path)
+                except Exception:
+                    continue
+                if path in known:
+                    updated += 1
+                else:
+                    added += 1
+        scanned = [os.path.abspath(f) + os.sep for f in folders]
+        missing = [p for p in known if p not in seen and any(p.startswith(f) for f in scanned)
+                   or not os.path.exists(p)]
+        with self._connect() as db:
+            db.executemany('DELETE FROM recordings WHERE path = ?', [(p,) for p in missing])
+        return {'added': added, 'updated': updated, 'removed': len(missing), 'total': len(known) + added - len(missing)}
+
+
+_default = None
+
+
+def default_library() -> Library:
+    global _default
+    if _default is None:
+        _default = Library()
+    return _default
+
+
+def record_finished(path: str, region=None, fps: float = None, source: str = None, wait: bool = False):
+    """Best-effort indexing hook for the recording front ends."""
+    try:
+        lib = default_library()
+        if wait:
+            lib.add(path, region=region, fps=fps, source=source)
+        else:
+            lib.add_async(path, region=region, fps=fps, source=source)
+    except Exception:
+        pass
+
+
+def _parse_date(text: str) -> float:
+    return datetime.fromisoformat(text).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recording library index')
+    parser.add_argument('--db', help='database path (default: library.db next to this file)')
+    sub = parser.add_subparsers(dest='command')
+    rb = sub.add_parser('rebuild', help='rescan output folders')
+    rb.add_argument('folders', nargs='*')
+    ls = sub.add_parser('list', help='query recordings')
+    ls.add_argument('--since', type=_parse_date, help='YYYY-MM-DD[THH:MM]')
+    ls.add_argument('--until', type=_parse_date)
+    ls.add_argument('--min-bytes', type=int)
+    ls.add_argument('--max-bytes', type=int)
+    ls.add_argument('--min-duration', type=float)
+    ls.add_argument('--max-duration', type=float)
+    ls.add_argument('--kind', choices=[e.lstrip('.') for e in MEDIA_EXTENSIONS])
+    ls.add_argument('--order', choices=sorted(ORDERS), default='created')
+    ls.add_argument('--asc', action='store_true')
+    ls.add_argument('--limit', type=int)
+    ls.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+    lib = Library(args.db)
+    if args.command == 'rebuild':
+        t0 = time.time()
+        res = lib.rebuild(args.folders or None)
+        print(f"added {res['added']}, updated {res['updated']}, removed {res['removed']}, "
+              f"{res['total']} recordings ({time.time() - t0:.1f}s)")
+    elif args.command == 'list':
+        rows = lib.query(since=args.since, until=args.until, min_bytes=args.min_bytes, max_bytes=args.max_bytes,
+                         min_duration=args.min_duration, max_duration=args.max_duration, kind=args.kind,
+                         order=args.order, descending=not args.asc, limit=args.limit)
+        if args.json:
+            print(json.dumps(rows, indent=2))
+        else:
+            for r in rows:
+                when = datetime.fromtimestamp(r['created']).strftime('%Y-%m-%d %H:%M:%S')
+                dur = f"{r['duration']:.1f}s" if r['duration'] is not None else '?'
+                print(f"{when}  {r['bytes'] / 1048576:7.2f} MB  {dur:>8}  {r['width']}x{r['height']}  {r['path']}")
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,8 @@ import traceback
 import os
 import time
 
+_T0 = time.perf_counter()
+
 # Crash Logger
 log_dir = os.path.join(os.path.dirname(__file__), 'logs')
 os.makedirs(log_dir, exist_ok=True)
@@ -19,13 +21,22 @@ try:
     from PyQt5 import QtWidgets, QtCore
     from overlay import OverlayWindow
     from toolbar import ToolBar
-    from recorder import ScreenRecorder
-    from converter import convert_mp4_to_gif
-    from clipboard_clean import copy_path_to_clipboard
-    from utils import ensure_dirs, timestamped_filename
+    from monitors import watch_qt
+    from window_snap import snapshot_index
+    from lazy import LazyObject, import_module, prefetch
+    from utils import ensure_dirs, scratch_filename, timestamped_filename
 except Exception:
     raise
 
+# Capture/encoding modules (cv2, mss, numpy, Pillow, imageio) are not needed
+# until the user records, so they are imported on first use and prefetched
+# in the background once the launcher window has painted.
+_HEAVY_MODULES = ('recorder', 'conversion_queue', 'preview', 'clipboard_clean')
+
+
+def copy_path_to_clipboard(path):
+    return import_module('clipboard_clean').copy_path_to_clipboard(path)
+
 
 def main():
     ensure_dirs()
@@ -39,6 +50,8 @@ def main():
     # This prevents the app from exiting when overlay/toolbar are hidden
     # during capture (they are hidden to avoid appearing in the recording).
     app.setQuitOnLastWindowClosed(False)
+    # capture-region mapping uses a cached monitor layout; drop it on screen changes
+    watch_qt(app)
 
     overlay = OverlayWindow()
     toolbar = ToolBar()
@@ -49,20 +62,50 @@ def main():
     except Exception:
         pass
 
-    recorder = ScreenRecorder()
+    recorder = LazyObject(lambda: import_module('recorder').ScreenRecorder())
+    previews = LazyObject(lambda: import_module('preview').PreviewService())
+
+    def _make_conversions():
+        # MP4 -> GIF conversions run here so the next recording can start at once
+        q = import_module('conversion_queue').ConversionQueue(parent=app)
+        q.finished.connect(_on_converted)
+        q.pending_changed.connect(_on_pending_changed)
+        return q
+    conversions = LazyObject(_make_conversions)
+
+    def _recording():
+        return recorder._lazy_loaded() and bool(getattr(recorder, '_thread', None)) and recorder._thread.is_alive()
 
     # Ensure recorder thread is stopped when the application is quitting
     def _on_about_to_quit():
         try:
-            if getattr(recorder, '_thread', None) and recorder._thread.is_alive():
+            if _recording():
                 recorder._stop_event.set()
                 recorder._thread.join(timeout=1)
         except Exception:
             pass
+        # a stop in progress: let it finish and run _on_stopped so its
+        # recording is queued for conversion below
+        try:
+            _stop_pool.waitForDone()
+            QtCore.QCoreApplication.sendPostedEvents()
+        except Exception:
+            pass
         try:
             _visibility_monitor.stop()
         except Exception:
             pass
+        try:
+            if previews._lazy_loaded():
+                previews.shutdown()
+        except Exception:
+            pass
+        # let queued conversions finish so no recording is left unconverted
+        try:
+            if conversions._lazy_loaded():
+                conversions.wait()
+        except Exception:
+            pass
 
     try:
         app.aboutToQuit.connect(_on_about_to_quit)
@@ -70,9 +113,20 @@ def main():
         pass
     # Default selection will be set after showing overlay so mapping functions work
 
+    # capture region of the running recording, and (region, intermediate MP4) of
+    # each GIF still converting, for the recording library and storage cleanup
+    _current_region = [None]
+    _pending_outputs = {}
+
     def on_start(rect):
         x, y, w, h = rect
-        output_mp4 = timestamped_filename('video', 'mp4')
+        _current_region[0] = tuple(rect)
+        # With ffmpeg available the GIF is encoded live from the capture pipe;
+        # otherwise record an intermediate MP4 and convert it on stop.
+        if import_module('recorder').ScreenRecorder.can_stream('.gif'):
+            output_mp4 = timestamped_filename('gif', 'gif')
+        else:
+            output_mp4 = scratch_filename('mp4')
         # Try to exclude overlay and toolbar windows from being captured (Windows only)
         try:
             if sys.platform == 'win32':
@@ -104,7 +158,7 @@ def main():
             recorder.start((x, y, w, h), fps=10, out_path=output_mp4)
             # give the recorder a brief moment to start and validate it is running
             time.sleep(0.12)
-            if not (getattr(recorder, '_thread', None) and recorder._thread.is_alive()):
+            if not (_recording()):
                 # recorder failed to start - surface error and return UI to main
                 try:
                     QtWidgets.QMessageBox.warning(None, 'Error', 'Failed to start recorder')
@@ -126,8 +180,31 @@ def main():
         except Exception:
             pass
 
+    # Stopping joins the capture thread, which waits for ffmpeg to finish
+    # encoding the tail of the recording; that runs on a worker thread and the
+    # rest of the stop is finished by _on_stopped back on the GUI thread.
+    class _StopSignals(QtCore.QObject):
+        done = QtCore.pyqtSignal(object)
+
+    class _StopJob(QtCore.QRunnable):
+        def run(self):
+            try:
+                path = recorder.stop()
+            except Exception:
+                path = None
+            _stop_signals.done.emit(path)
+
+    _stop_signals = _StopSignals()
+    _stop_pool = QtCore.QThreadPool()
+    _stop_pool.setMaxThreadCount(1)
+    _stopping = [False]
+
     def on_stop():
-        mp4_path = recorder.stop()
+        if _stopping[0]:
+            return
+        _stopping[0] = True
+        # the capture thread stays alive until the encode is flushed; the
+        # monitor must not mistake the hidden toolbar for a crash meanwhile
         try:
             _visibility_monitor.stop()
         except Exception:
@@ -158,24 +235,100 @@ def main():
                     pass
         except Exception:
             pass
+        _stop_pool.start(_StopJob())
+
+    def _on_stopped(mp4_path):
+        _stopping[0] = False
+        if _shutdown_initiated[0]:
+            # quitting: only make sure the recording still gets converted
+            if mp4_path and not mp4_path.lower().endswith('.gif'):
+                conversions.submit(mp4_path, timestamped_filename('gif', 'gif'), fps=10, vfr=True)
+            return
         if not mp4_path:
             QtWidgets.QMessageBox.warning(None, 'Error', 'No recording produced')
             _return_to_main()
             return
 
-        gif_path = timestamped_filename('gif', 'gif')
-        ok = convert_mp4_to_gif(mp4_path, gif_path, fps=10)
+        if mp4_path.lower().endswith('.gif'):
+            # already encoded while recording
+            _pending_outputs[mp4_path] = (_current_region[0], None)
+            _return_to_main()
+            _on_converted(mp4_path, True)
+        else:
+            gif_path = timestamped_filename('gif', 'gif')
+            _pending_outputs[gif_path] = (_current_region[0], mp4_path)
+            conversions.submit(mp4_path, gif_path, fps=10, vfr=True)
+            _return_to_main()
+
+    # Completion notices that arrive while a new recording is running are
+    # held back so no dialog pops up inside the captured region.
+    _held_notices = []
+    _open_boxes = []
+
+    def _on_converted(gif_path, ok):
+        region, source = _pending_outputs.pop(gif_path, (None, None))
         if ok:
             copy_path_to_clipboard(gif_path)
-            QtWidgets.QMessageBox.information(None, '完成', f'GIF已生成并复制至剪切板。\n路径:{gif_path}\n按Ctrl+V粘贴至目标位置。')
+            import_module('library').record_finished(gif_path, region=region, fps=10, source=source)
+            import_module('storage').recording_finished(gif_path, intermediate=source)
+        if _recording():
+            _held_notices.append((gif_path, ok))
+            return
+        _notify(gif_path, ok)
+
+    def _notify(gif_path, ok):
+        if ok:
+            _show_done(gif_path)
         else:
             QtWidgets.QMessageBox.warning(None, 'Error', 'Failed to convert to GIF')
-        
-        _return_to_main()
+
+    def _flush_notices():
+        while _held_notices:
+            _notify(*_held_notices.pop(0))
+
+    def _on_pending_changed(count):
+        try:
+            initial.label.setText(f'正在转换 {count} 个GIF…' if count else '点击下方按钮进入录制模式')
+        except Exception:
+            pass
+
+    def _show_done(gif_path):
+        box = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Information, '完成',
+                                    f'GIF已生成并复制至剪切板。\n路径:{gif_path}\n按Ctrl+V粘贴至目标位置。')
+        # The thumbnail renders on the preview pool; poll its future from the
+        # GUI thread and swap it in as the box icon once it is ready.
+        poll = QtCore.QTimer(box)
+        try:
+            future = previews.thumbnail(gif_path)
+        except Exception:
+            future = None
+
+        def _check():
+            if future is None or not future.done():
+                return
+            poll.stop()
+            try:
+                from PyQt5 import QtGui
+                pix = QtGui.QPixmap(future.result())
+                if not pix.isNull():
+                    box.setIconPixmap(pix)
+            except Exception:
+                pass
+
+        poll.timeout.connect(_check)
+        poll.start(50)
+        _check()
+        # non-modal: conversions finish in the background and must not block the UI
+        box.setModal(False)
+        box.setAttribute(QtCore.Qt.WA_DeleteOnClose, True)
+        box.finished.connect(lambda *_: (poll.stop(), _open_boxes.remove(box) if box in _open_boxes else None))
+        _open_boxes.append(box)
+        box.show()
 
     # Initial launcher window
     class InitialWindow(QtWidgets.QWidget):
         record_requested = QtCore.pyqtSignal()
+        first_painted = QtCore.pyqtSignal()
 
         def __init__(self):
             super().__init__()
@@ -190,6 +343,14 @@ def main():
             layout.addWidget(self.record_btn)
             self.setLayout(layout)
             self.record_btn.clicked.connect(self.record_requested.emit)
+            self._painted = False
+
+        def paintEvent(self, event):
+            super().paintEvent(event)
+            if not self._painted:
+                self._painted = True
+                # after the paint has been flushed to the screen
+                QtCore.QTimer.singleShot(0, self.first_painted.emit)
 
         def closeEvent(self, event):
             try:
@@ -199,6 +360,21 @@ def main():
 
     initial = InitialWindow()
 
+    def _on_first_paint():
+        # Startup probe used by test_startup_budget.py: report and exit
+        if os.environ.get('SCREEN2GIF_STARTUP_PROBE'):
+            import json
+            print(json.dumps({'startup_s': time.perf_counter() - _T0,
+                              'loaded': [m for m in _HEAVY_MODULES + ('cv2', 'numpy', 'mss', 'PIL', 'imageio')
+                                         if m in sys.modules]}), flush=True)
+            QtCore.QTimer.singleShot(0, app.quit)
+            return
+        prefetch(_HEAVY_MODULES)
+        # size index and retention pass for video/ and gif/ on a background thread
+        import_module('storage').default_storage().collect()
+
+    initial.first_painted.connect(_on_first_paint)
+
     def _return_to_main():
         # Stop any active recording/countdown
         # If application is in shutdown, don't reopen the initial window
@@ -208,7 +384,7 @@ def main():
                 return
         except Exception:
             pass
-        if getattr(recorder, '_thread', None) and recorder._thread.is_alive():
+        if _recording():
             recorder.stop()
         try:
             _visibility_monitor.stop()
@@ -231,6 +407,7 @@ def main():
         initial.showNormal()
         initial.raise_()
         initial.activateWindow()
+        _flush_notices()
 
     # Shared timer for countdown
     _countdown_timer = QtCore.QTimer()
@@ -243,7 +420,7 @@ def main():
 
     def _monitor_check():
         try:
-            if getattr(recorder, '_thread', None) and recorder._thread.is_alive():
+            if _recording():
                 # If toolbar is not visible and we didn't just hide it intentionally for capture,
                 # assume an abnormal UI exit and quit the app so terminal exits.
                 if not toolbar.isVisible():
@@ -288,7 +465,7 @@ def main():
         except Exception:
             pass
         try:
-            if getattr(recorder, '_thread', None) and recorder._thread.is_alive():
+            if _recording():
                 recorder.stop()
         except Exception:
             pass
@@ -348,6 +525,7 @@ def main():
 
     toolbar.start_requested.connect(_handle_start_clicked)
     toolbar.stop_requested.connect(on_stop)
+    _stop_signals.done.connect(_on_stopped)
     toolbar.close_requested.connect(_handle_toolbar_close)
 
     def _enter_record_mode():
@@ -355,6 +533,11 @@ def main():
         try:
             _countdown_timer.stop()
         except: pass
+        # Snapshot window rectangles for snap-to-window selection (W toggles)
+        try:
+            overlay.set_window_index(snapshot_index())
+        except Exception:
+            pass
         toolbar.start_btn.setEnabled(True)
         toolbar.start_btn.setText('Start')
 
@@ -393,8 +576,16 @@ def main():
             pass
 
     initial.record_requested.connect(_enter_record_mode)
-    # Keep toolbar above overlay during interactions: bring-to-front when overlay emits interaction
+    # Keep toolbar above overlay during interactions. While dragging only a
+    # cheap raise is done (at most once per refresh); the full z-order fix
+    # (activate + SetWindowPos on Windows) runs once when the drag ends.
     try:
+        def _raise_toolbar():
+            try:
+                toolbar.raise_()
+            except Exception:
+                pass
+
         def _bring_toolbar_top():
             try:
                 toolbar.raise_()
@@ -411,7 +602,8 @@ def main():
             except Exception:
                 pass
 
-        overlay.interaction.connect(_bring_toolbar_top)
+        overlay.interaction.connect(_raise_toolbar)
+        overlay.interaction_finished.connect(_bring_toolbar_top)
     except Exception:
         pass
     # On Windows, explicitly adjust Z-order using SetWindowPos to ensure toolbar is above overlay
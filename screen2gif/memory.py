@@ -0,0 +1,100 @@
+"""Process memory (RSS) measurement and periodic reporting."""
+import os
+import sys
+import threading
+from datetime import datetime
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process in bytes (0 if unknown)."""
+    try:
+        import psutil
+        return int(psutil.Process().memory_info().rss)
+    except Exception:
+        pass
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/self/statm', 'r') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except Exception:
+            pass
+    if sys.platform == 'win32':
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                    (name, ctypes.c_size_t) for name in (
+                        'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                        'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage',
+                        'PagefileUsage', 'PeakPagefileUsage')]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return int(counters.WorkingSetSize)
+        except Exception:
+            pass
+    try:
+        import resource
+        # ru_maxrss is a peak, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return int(peak if sys.platform == 'darwin' else peak * 1024)
+    except Exception:
+        return 0
+
+
+class RssMonitor:
+    """Sample RSS on a background thread, tracking the peak and logging samples.
+
+    Use as a context manager around a long-running job; samples are appended
+    to ``log_path`` (``logs/memory.log`` by default) tagged with ``label``.
+    """
+
+    def __init__(self, label: str = '', interval: float = 1.0, log_path: str = None):
+        self.label = label
+        self.interval = interval
+        self.log_path = log_path or os.path.join(os.path.dirname(__file__), 'logs', 'memory.log')
+        self.peak = 0
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _log(self, msg: str):
+        try:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {self.label} {msg}\n")
+        except Exception:
+            pass
+
+    def sample(self) -> int:
+        rss = rss_bytes()
+        self.peak = max(self.peak, rss)
+        self.samples += 1
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._log(f'rss={self.sample() / 1048576:.1f}MB')
+
+    def start(self):
+        self._log(f'start rss={self.sample() / 1048576:.1f}MB')
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> int:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._log(f'end rss={self.sample() / 1048576:.1f}MB peak={self.peak / 1048576:.1f}MB')
+        return self.peak
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,191 @@
+"""Cached monitor topology and logical -> physical coordinate mapping.
+
+Qt reports screen geometry in logical (DPI-scaled) coordinates while mss
+captures in physical pixels. ``MonitorTopology`` snapshots both once: every
+Qt screen with its logical geometry, device pixel ratio and the physical
+origin of the matching mss monitor, plus the physical virtual-desktop bounds.
+Mapping a selection is then pure arithmetic on that snapshot.
+
+``topology()`` returns the cached snapshot and ``invalidate()`` drops it;
+``watch_qt(app)`` hooks the invalidation to Qt's screenAdded/screenRemoved and
+per-screen geometryChanged signals. Nothing here imports PyQt5, so the
+recorder and the headless CLI can share the cache.
+"""
+import os
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+Rect = Tuple[int, int, int, int]
+
+
+class Screen:
+    def __init__(self, logical: Rect, dpr: float, physical_origin: Tuple[int, int]):
+        self.logical = logical
+        self.dpr = dpr
+        self.physical_origin = physical_origin
+
+    def contains(self, x: float, y: float) -> bool:
+        lx, ly, lw, lh = self.logical
+        return lx <= x < lx + lw and ly <= y < ly + lh
+
+    def __repr__(self):
+        return f'Screen(logical={self.logical}, dpr={self.dpr}, physical_origin={self.physical_origin})'
+
+
+def _match_origin(logical: Rect, dpr: float, monitors: List[dict]) -> Tuple[int, int]:
+    # On Windows/Qt the screen origin is often already in physical pixels even
+    # when width/height are logical, so try the unscaled origin first.
+    ox, oy = int(round(logical[0])), int(round(logical[1]))
+    sx, sy = int(round(logical[0] * dpr)), int(round(logical[1] * dpr))
+    for cx, cy in ((ox, oy), (sx, sy)):
+        for m in monitors:
+            try:
+                if abs(int(m.get('left', 0)) - cx) < 4 and abs(int(m.get('top', 0)) - cy) < 4:
+                    return int(m['left']), int(m['top'])
+            except Exception:
+                continue
+    return ox, oy
+
+
+class MonitorTopology:
+    """Immutable snapshot of the screens; build with ``MonitorTopology.capture()``."""
+
+    def __init__(self, screens: List[Screen], monitors: List[dict]):
+        self.screens = screens  # primary first
+        self.monitors = monitors  # mss layout: [virtual desktop, monitor 1, ...]
+        v = monitors[0] if monitors else {}
+        self.virtual = (int(v.get('left', 0)), int(v.get('top', 0)),
+                        int(v.get('width', 0)), int(v.get('height', 0)))
+        self.built_at = time.time()
+
+    @classmethod
+    def capture(cls, qt_screens=None) -> 'MonitorTopology':
+        """Snapshot mss monitors and (if given) Qt ``QScreen`` objects."""
+        try:
+            import mss as _mss
+            with _mss.mss() as sct:
+                monitors = [dict(m) for m in sct.monitors]
+        except Exception:
+            monitors = []
+        screens = []
+        for qs in qt_screens or []:
+            try:
+                g = qs.geometry()
+                logical = (g.x(), g.y(), g.width(), g.height())
+                dpr = float(qs.devicePixelRatioF() if hasattr(qs, 'devicePixelRatioF') else qs.devicePixelRatio())
+            except Exception:
+                continue
+            screens.append(Screen(logical, dpr, _match_origin(logical, dpr, monitors[1:])))
+        if not screens:
+            # no Qt: logical == physical, one screen per mss monitor
+            for m in monitors[1:] or [{'left': 0, 'top': 0, 'width': 0, 'height': 0}]:
+                r = (int(m['left']), int(m['top']), int(m['width']), int(m['height']))
+                screens.append(Screen(r, 1.0, (r[0], r[1])))
+        return cls(screens, monitors)
+
+    def screen_at(self, x: float, y: float) -> Screen:
+        for s in self.screens:
+            if s.contains(x, y):
+                return s
+        return self.screens[0]
+
+    def to_physical(self, rect: Rect) -> Rect:
+        """Map a logical (x, y, w, h) rect to physical pixels on the screen containing its origin."""
+        x, y, w, h = rect
+        s = self.screen_at(x, y)
+        return (s.physical_origin[0] + int(round((x - s.logical[0]) * s.dpr)),
+                s.physical_origin[1] + int(round((y - s.logical[1]) * s.dpr)),
+                int(round(w * s.dpr)), int(round(h * s.dpr)))
+
+    def to_logical(self, rect: Rect) -> Rect:
+        """Inverse of ``to_physical`` for a physical rect (e.g. a native window)."""
+        x, y, w, h = rect
+        s = self.screens[0]
+        for cand in self.screens:
+            px, py = cand.physical_origin
+            if px <= x < px + cand.logical[2] * cand.dpr and py <= y < py + cand.logical[3] * cand.dpr:
+                s = cand
+                break
+        return (s.logical[0] + int(round((x - s.physical_origin[0]) / s.dpr)),
+                s.logical[1] + int(round((y - s.physical_origin[1]) / s.dpr)),
+                int(round(w / s.dpr)), int(round(h / s.dpr)))
+
+    def clamp(self, rect: Rect) -> Rect:
+        """Shift a physical rect so it lies inside the virtual desktop."""
+        left, top, w, h = rect
+        vleft, vtop, vw, vh = self.virtual
+        if not vw or not vh:
+            return rect
+        vright, vbottom = vleft + vw, vtop + vh
+        left = max(left, vleft)
+        top = max(top, vtop)
+        if left + w > vright:
+            left = max(vleft, vright - w)
+        if top + h > vbottom:
+            top = max(vtop, vbottom - h)
+        return (left, top, w, h)
+
+
+_lock = threading.Lock()
+_cached: Optional[MonitorTopology] = None
+
+
+def _qt_screens():
+    # Only use Qt if the host process already has an application running.
+    qtw = sys.modules.get('PyQt5.QtWidgets')
+    if qtw is None or qtw.QApplication.instance() is None:
+        return None
+    primary = qtw.QApplication.primaryScreen()
+    return [primary] + [s for s in qtw.QApplication.screens() if s is not primary]
+
+
+def _log(topo: MonitorTopology):
+    try:
+        dbgdir = os.path.join(os.path.dirname(__file__), 'logs')
+        os.makedirs(dbgdir, exist_ok=True)
+        with open(os.path.join(dbgdir, 'capture_overlay_debug.txt'), 'a', encoding='utf-8') as f:
+            f.write(f"time: {topo.built_at}\ntopology: {topo.screens}\nvirtual: {topo.virtual}\n\n")
+    except Exception:
+        pass
+
+
+def topology() -> MonitorTopology:
+    """Return the cached topology, building it on first use or after ``invalidate()``."""
+    global _cached
+    with _lock:
+        if _cached is None:
+            _cached = MonitorTopology.capture(_qt_screens())
+            _log(_cached)
+        return _cached
+
+
+def invalidate(*_):
+    global _cached
+    with _lock:
+        _cached = None
+
+
+def watch_qt(app):
+    """Invalidate the cache whenever Qt reports a screen change."""
+    def _watch_screen(screen):
+        for sig in ('geometryChanged', 'logicalDotsPerInchChanged', 'physicalDotsPerInchChanged'):
+            try:
+                getattr(screen, sig).connect(invalidate)
+            except Exception:
+                pass
+
+    def _added(screen):
+        _watch_screen(screen)
+        invalidate()
+
+    try:
+        app.screenAdded.connect(_added)
+        app.screenRemoved.connect(invalidate)
+        app.primaryScreenChanged.connect(invalidate)
+        for s in app.screens():
+            _watch_screen(s)
+    except Exception:
+        pass
+    invalidate()
@@ -1,8 +1,19 @@
+import os
+import time
+
 from PyQt5 import QtWidgets, QtCore, QtGui
 
+try:
+    from monitors import topology
+except ImportError:
+    from .monitors import topology
+
 
 class OverlayWindow(QtWidgets.QWidget):
+    # ``interaction`` is coalesced to at most one emission per display refresh
+    # while dragging; ``interaction_finished`` fires once when a drag ends.
     interaction = QtCore.pyqtSignal()
+    interaction_finished = QtCore.pyqtSignal()
     def __init__(self):
         super().__init__()
         # Keep overlay frameless and make it stay on top of normal windows
@@ -26,13 +37,144 @@ class OverlayWindow(QtWidgets.QWidget):
         self._blink_timer.setInterval(500)
         self._blink_timer.timeout.connect(self._toggle_blink)
 
+        # Coalesces drag interactions to one signal per refresh interval
+        self._interaction_timer = QtCore.QTimer(self)
+        self._interaction_timer.setSingleShot(True)
+        self._interaction_timer.timeout.connect(self._emit_interaction)
+
+        # Snap-to-window: spatial index of native window rects (physical
+        # pixels) snapshotted when record mode opens
+        self._window_index = None
+        self.snap_enabled = False
+        self._hover_rect = None  # QRect (widget coords) of the window under the cursor
+        self._snap_candidate = None  # hovered window at mouse press, applied on click release
+
+        # Cached fullscreen dim layer and repaint instrumentation
+        self._dim_layer = None
+        self._paint_count = 0
+        self._paint_s = 0.0
+        self._paint_max_s = 0.0
+        self._paint_pixels = 0
+
+    def _selection_damage(self, rect):
+        """Area covered by the border and handles of ``rect`` (widget coords)."""
+        if not rect or rect.isNull():
+            return QtCore.QRect()
+        m = self.handle_size // 2 + 2
+        return rect.normalized().adjusted(-m, -m, m, m)
+
+    def _border_damage(self, rect):
+        """Only the strip the red border is drawn in."""
+        outer = QtGui.QRegion(rect.adjusted(-2, -2, 2, 2))
+        return outer.subtracted(QtGui.QRegion(rect.adjusted(2, 2, -2, -2)))
+
+    def _update_selection(self, old_rect):
+        # Repaint only where the old and new selection (border, handles and
+        # cleared interior) were; everything else keeps its dim layer.
+        if (old_rect is None or old_rect.isNull()) != (self.selection_rect is None or self.selection_rect.isNull()):
+            self.update()
+            return
+        self.update(QtGui.QRegion(self._selection_damage(old_rect)).united(
+            QtGui.QRegion(self._selection_damage(self.selection_rect))))
+
+    def _refresh_interval_ms(self):
+        try:
+            screen = self.screen() if hasattr(self, 'screen') else QtWidgets.QApplication.primaryScreen()
+            rate = float(screen.refreshRate())
+        except Exception:
+            rate = 0.0
+        return int(round(1000.0 / rate)) if rate > 1.0 else 16
+
+    def _request_interaction(self):
+        if not self._interaction_timer.isActive():
+            self._interaction_timer.start(self._refresh_interval_ms())
+
+    def _emit_interaction(self):
+        try:
+            self.interaction.emit()
+        except Exception:
+            pass
+
+    def set_window_index(self, index):
+        """Use ``index`` (a ``window_snap.WindowIndex``) for snap-to-window selection."""
+        self._window_index = index
+        self.set_snap_enabled(bool(index is not None and len(index)))
+
+    def set_snap_enabled(self, enabled):
+        self.snap_enabled = bool(enabled) and self._window_index is not None
+        self.setMouseTracking(self.snap_enabled)
+        self._set_hover(None)
+
+    def _window_at(self, pos):
+        if not self.snap_enabled:
+            return None
+        try:
+            topo = topology()
+            g = self.mapToGlobal(pos)
+            px, py = topo.to_physical((g.x(), g.y(), 1, 1))[:2]
+            hit = self._window_index.topmost(px, py)
+            if hit is None:
+                return None
+            x, y, w, h = topo.to_logical((hit.x, hit.y, hit.w, hit.h))
+            return QtCore.QRect(self.mapFromGlobal(QtCore.QPoint(x, y)), QtCore.QSize(w, h))
+        except Exception:
+            return None
+
+    def _set_hover(self, rect):
+        if rect == self._hover_rect:
+            return
+        old, self._hover_rect = self._hover_rect, rect
+        for r in (old, rect):
+            if r is not None:
+                self.update(self._border_damage(r))
+
+    def keyPressEvent(self, event):
+        # W toggles snapping to windows
+        if event.key() == QtCore.Qt.Key_W and self._window_index is not None and not self.is_recording:
+            self.set_snap_enabled(not self.snap_enabled)
+            return
+        super().keyPressEvent(event)
+
     def _toggle_blink(self):
         self._blink_visible = not self._blink_visible
-        self.update()
+        if self.selection_rect and not self.selection_rect.isNull():
+            self.update(self._border_damage(self.selection_rect.normalized()))
+
+    def _dim_pixmap(self):
+        dpr = self.devicePixelRatioF() if hasattr(self, 'devicePixelRatioF') else 1.0
+        size = self.size() * dpr
+        if self._dim_layer is None or self._dim_layer.size() != size:
+            self._dim_layer = QtGui.QPixmap(size)
+            self._dim_layer.setDevicePixelRatio(dpr)
+            self._dim_layer.fill(QtGui.QColor(0, 0, 0, int(255 * 0.3)))
+        return self._dim_layer
+
+    def paint_stats(self):
+        """Repaint counters: count, mean/max time (ms) and mean damaged pixels."""
+        n = max(1, self._paint_count)
+        return {'paints': self._paint_count, 'mean_ms': 1000.0 * self._paint_s / n,
+                'max_ms': 1000.0 * self._paint_max_s, 'mean_pixels': self._paint_pixels / n,
+                'screen_pixels': self.width() * self.height()}
+
+    def hideEvent(self, event):
+        if self._paint_count:
+            try:
+                dbgdir = os.path.join(os.path.dirname(__file__), 'logs')
+                os.makedirs(dbgdir, exist_ok=True)
+                with open(os.path.join(dbgdir, 'overlay_paint.log'), 'a', encoding='utf-8') as f:
+                    f.write(f"time: {time.time()} {self.paint_stats()}\n")
+            except Exception:
+                pass
+            self._paint_count = 0
+            self._paint_s = self._paint_max_s = 0.0
+            self._paint_pixels = 0
+        super().hideEvent(event)
 
     def start_recording(self):
         self.is_recording = True
         self._blink_visible = True
+        self._snap_candidate = None
+        self.set_snap_enabled(False)
         # Allow clicks to pass through so the user can interact with apps while recording
         try:
             self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents, True)
@@ -52,15 +194,25 @@ class OverlayWindow(QtWidgets.QWidget):
         self.update()
 
     def paintEvent(self, event):
+        t0 = time.perf_counter()
         painter = QtGui.QPainter(self)
-        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        region = event.region()
+        rects = region.rects()
+        painter.setClipRegion(region)
 
-        # Dim the screen only during selection; keep it fully transparent while recording
+        # Dim the screen only during selection; keep it fully transparent while recording.
+        # Source mode replaces the damaged pixels outright, from the cached layer.
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
         if not self.is_recording:
-            overlay_color = QtGui.QColor(0, 0, 0, int(255 * 0.3))
-            painter.fillRect(self.rect(), overlay_color)
+            dim = self._dim_pixmap()
+            d = dim.devicePixelRatio()
+            for r in rects:
+                painter.drawPixmap(QtCore.QRectF(r), dim, QtCore.QRectF(r.x() * d, r.y() * d, r.width() * d, r.height() * d))
         else:
-            painter.fillRect(self.rect(), QtCore.Qt.transparent)
+            for r in rects:
+                painter.fillRect(r, QtCore.Qt.transparent)
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode_SourceOver)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
 
         # clear the selection area from the overlay so underlying content shows through
         if self.selection_rect and not self.selection_rect.isNull():
@@ -85,7 +237,23 @@ class OverlayWindow(QtWidgets.QWidget):
             painter.setBrush(brush)
             painter.setPen(pen2)
             for h in self.control_handles:
-                painter.drawRect(QtCore.QRectF(h))
+                if region.intersects(h.adjusted(-1, -1, 1, 1)):
+                    painter.drawRect(QtCore.QRectF(h))
+
+        # window under the cursor while snapping
+        if self._hover_rect is not None and not self.is_recording and self._hover_rect != self.selection_rect:
+            pen = QtGui.QPen(QtGui.QColor(0, 160, 255))
+            pen.setWidth(2)
+            painter.setPen(pen)
+            painter.setBrush(QtCore.Qt.NoBrush)
+            painter.drawRect(QtCore.QRectF(self._hover_rect))
+        painter.end()
+
+        dt = time.perf_counter() - t0
+        self._paint_count += 1
+        self._paint_s += dt
+        self._paint_max_s = max(self._paint_max_s, dt)
+        self._paint_pixels += sum(r.width() * r.height() for r in rects)
 
     def mousePressEvent(self, event):
         if event.button() != QtCore.Qt.LeftButton:
@@ -99,14 +267,19 @@ class OverlayWindow(QtWidgets.QWidget):
                 self._drag_offset = pos
                 return
 
+        # clicking a highlighted window selects it (applied on release, so a
+        # drag that starts over a window still draws a manual selection)
+        if self.snap_enabled and self._hover_rect is not None:
+            self._snap_candidate = QtCore.QRect(self._hover_rect)
+            self._start_pos = pos
+            return
+
         # start new selection
+        old = self.selection_rect
         self._start_pos = pos
         self.selection_rect = QtCore.QRect(pos, pos)
-        try:
-            self.interaction.emit()
-        except Exception:
-            pass
-        self.update()
+        self._request_interaction()
+        self._update_selection(old)
 
     def mouseMoveEvent(self, event):
         pos = event.pos()
@@ -141,17 +314,25 @@ class OverlayWindow(QtWidgets.QWidget):
                 x1 = pos.x()
 
             newr = QtCore.QRect(QtCore.QPoint(min(x1, x2), min(y1, y2)), QtCore.QPoint(max(x1, x2), max(y1, y2)))
+            old = self.selection_rect
             self.selection_rect = newr
-            self.update()
+            self._update_selection(old)
+            return
+
+        if self._snap_candidate is not None and self._start_pos is not None:
+            if (pos - self._start_pos).manhattanLength() <= 4:
+                return
+            self._snap_candidate = None  # moved: manual selection after all
+
+        if self._start_pos is None and self.snap_enabled:
+            self._set_hover(self._window_at(pos))
             return
 
         if self._start_pos:
+            old = self.selection_rect
             self.selection_rect = QtCore.QRect(self._start_pos, pos).normalized()
-            try:
-                self.interaction.emit()
-            except Exception:
-                pass
-            self.update()
+            self._request_interaction()
+            self._update_selection(old)
 
     def mouseReleaseEvent(self, event):
         if event.button() != QtCore.Qt.LeftButton:
@@ -160,14 +341,20 @@ class OverlayWindow(QtWidgets.QWidget):
         self._dragging_handle = None
         self._drag_offset = None
         self._start_pos = None
+        old = self.selection_rect
+        if self._snap_candidate is not None:
+            self.selection_rect = self._snap_candidate
+            self._snap_candidate = None
         if self.selection_rect:
             self.selection_rect = self.selection_rect.normalized()
             self.update_control_handles()
+        # the drag is over: drop any pending coalesced event and report the end once
+        self._interaction_timer.stop()
         try:
-            self.interaction.emit()
+            self.interaction_finished.emit()
         except Exception:
             pass
-        self.update()
+        self._update_selection(old)
 
     def update_control_handles(self):
         self.control_handles = []
@@ -211,109 +398,12 @@ class OverlayWindow(QtWidgets.QWidget):
         ny = y + padding
         nw = max(1, w - 2 * padding)
         nh = max(1, h - 2 * padding)
-        # Determine which QScreen contains the selection (logical coords)
+        # Map logical -> physical pixels with the cached monitor topology
+        # (rebuilt only when Qt reports a screen change).
         try:
-            screen = QtWidgets.QApplication.screenAt(QtCore.QPoint(int(nx), int(ny)))
-            if screen is None:
-                screen = QtWidgets.QApplication.primaryScreen()
-
-            # devicePixelRatio may be float (1.0, 1.25, 1.5...) depending on Qt build
-            try:
-                # prefer devicePixelRatioF if available
-                dpr = float(screen.devicePixelRatioF()) if hasattr(screen, 'devicePixelRatioF') else float(screen.devicePixelRatio())
-            except Exception:
-                dpr = float(self.devicePixelRatioF() if hasattr(self, 'devicePixelRatioF') else 1.0)
-
-            # Map logical selection relative to screen logical origin, then scale to physical pixels
-            sgeom = screen.geometry()
-            logical_origin_x = sgeom.x()
-            logical_origin_y = sgeom.y()
-
-            # On Windows/Qt the screen origin is often already in physical pixels even when
-            # width/height are logical, so start with the unscaled origin.
-            phys_origin_x = int(round(logical_origin_x))
-            phys_origin_y = int(round(logical_origin_y))
-            scaled_origin_x = int(round(logical_origin_x * dpr))
-            scaled_origin_y = int(round(logical_origin_y * dpr))
-
-            # Try to find matching physical monitor via mss to get accurate physical origin
-            try:
-                import mss as _mss
-                mons = _mss.mss().monitors
-                matched = None
-                for m in mons[1:]:
-                    try:
-                        m_left = int(m.get('left', 0))
-                        m_top = int(m.get('top', 0))
-                    except Exception:
-                        continue
-                    # First try matching against the unscaled origin; fall back to scaled comparison
-                    if abs(m_left - phys_origin_x) < 4 and abs(m_top - phys_origin_y) < 4:
-                        matched = m
-                        break
-                    if abs(m_left - scaled_origin_x) < 4 and abs(m_top - scaled_origin_y) < 4:
-                        matched = m
-                        break
-                if matched:
-                    phys_origin_x = int(matched.get('left', phys_origin_x))
-                    phys_origin_y = int(matched.get('top', phys_origin_y))
-            except Exception:
-                pass
-
-            phys_left = phys_origin_x + int(round((nx - logical_origin_x) * dpr))
-            phys_top = phys_origin_y + int(round((ny - logical_origin_y) * dpr))
-            phys_w = int(round(nw * dpr))
-            phys_h = int(round(nh * dpr))
+            topo = topology()
+            return topo.clamp(topo.to_physical((nx, ny, nw, nh)))
         except Exception:
             # Fallback: scale by widget DPR
             dpr = float(self.devicePixelRatioF() if hasattr(self, 'devicePixelRatioF') else 1.0)
-            phys_left = int(round(nx * dpr))
-            phys_top = int(round(ny * dpr))
-            phys_w = int(round(nw * dpr))
-            phys_h = int(round(nh * dpr))
-
-        # write overlay->capture mapping debug info
-        try:
-            import os, time
-            dbgdir = os.path.join(os.path.dirname(__file__), 'logs')
-            os.makedirs(dbgdir, exist_ok=True)
-            dbgfile = os.path.join(dbgdir, 'capture_overlay_debug.txt')
-            with open(dbgfile, 'a', encoding='utf-8') as f:
-                f.write(f"time: {time.time()}\n")
-                f.write(f"logical_sel: {(x, y, w, h)}\n")
-                f.write(f"inset_sel: {(nx, ny, nw, nh)}\n")
-                try:
-                    sgeom = screen.geometry()
-                    f.write(f"screen_geom: {sgeom.x()},{sgeom.y()},{sgeom.width()},{sgeom.height()}\n")
-                except Exception:
-                    f.write("screen_geom: <error>\n")
-                f.write(f"dpr: {dpr}\n")
-                try:
-                    f.write(f"phys_origin: {phys_origin_x},{phys_origin_y}\n")
-                    f.write(f"phys_rect: {(phys_left, phys_top, phys_w, phys_h)}\n")
-                except Exception:
-                    f.write("phys: <error>\n")
-                f.write('\n')
-        except Exception:
-            pass
-
-        # Clamp to virtual desktop physical bounds if mss available
-        try:
-            import mss as _mss
-            v = _mss.mss().monitors[0]
-            vleft = int(v.get('left', 0))
-            vtop = int(v.get('top', 0))
-            vright = vleft + int(v.get('width', 0))
-            vbottom = vtop + int(v.get('height', 0))
-            if phys_left < vleft:
-                phys_left = vleft
-            if phys_top < vtop:
-                phys_top = vtop
-            if phys_left + phys_w > vright:
-                phys_left = max(vleft, vright - phys_w)
-            if phys_top + phys_h > vbottom:
-                phys_top = max(vtop, vbottom - phys_h)
-        except Exception:
-            pass
-
-        return (phys_left, phys_top, phys_w, phys_h)
+            return (int(round(nx * dpr)), int(round(ny * dpr)), int(round(nw * dpr)), int(round(nh * dpr)))
@@ -0,0 +1,167 @@
+"""Stream raw capture frames into a long-lived ffmpeg process.
+
+``FfmpegPipeWriter`` mimics the small part of ``cv2.VideoWriter`` used by
+``ScreenRecorder`` (``isOpened``/``write``/``release``) so the capture loop
+does not care whether frames go to an mp4v file or straight into ffmpeg.
+Frames are handed to a feeder thread through a bounded queue; time spent
+blocked on the pipe and frames dropped because ffmpeg fell behind are
+tracked in ``stats``.
+
+ffmpeg reads the raw stream at a constant ``fps``, so frames carry their
+capture time and each one is placed in its slot on that grid: when a stall
+or a dropped frame leaves slots empty, the previous frame is written again
+to fill them, and the output keeps the real duration of the capture instead
+of playing back faster. ffmpeg's stderr is drained on its own thread (a full
+pipe would block the encoder) and its tail is kept for error reports.
+"""
+import collections
+import os
+import queue
+import subprocess
+import threading
+import time
+from typing import Tuple
+
+# output extension -> ffmpeg output arguments. The GIF palette is generated
+# per frame (stats_mode=single + new=1): a whole-stream palettegen only emits
+# its palette at EOF, which makes ffmpeg buffer every raw frame until stop.
+_OUTPUT_ARGS = {
+    '.gif': [
+        '-filter_complex',
+        'split[s0][s1];[s0]palettegen=stats_mode=single[p];[s1][p]paletteuse=new=1:dither=bayer:bayer_scale=3',
+        '-loop', '0',
+    ],
+    '.webp': ['-c:v', 'libwebp', '-lossless', '0', '-q:v', '75', '-loop', '0'],
+}
+
+STREAMABLE_EXTENSIONS = tuple(_OUTPUT_ARGS)
+
+
+def is_streamable(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in _OUTPUT_ARGS
+
+
+class FfmpegPipeWriter:
+    def __init__(self, out_path: str, fps: int, size: Tuple[int, int], pix_fmt: str = 'bgra',
+                 queue_size: int = 32, ffmpeg: str = 'ffmpeg'):
+        self.out_path = out_path
+        self.pix_fmt = pix_fmt
+        self.size = size
+        width, height = size
+        ext = os.path.splitext(out_path)[1].lower()
+        cmd = [
+            ffmpeg, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', pix_fmt, '-s', f'{width}x{height}', '-r', str(fps),
+            '-i', '-',
+        ] + _OUTPUT_ARGS[ext] + [out_path]
+        self.stats = {
+            'frames_written': 0,
+            'frames_dropped': 0,
+            'frames_repeated': 0,
+            'frames_coalesced': 0,
+            'queue_high_water': 0,
+            'write_blocked_s': 0.0,
+            'encode_tail_s': 0.0,
+            'returncode': None,
+        }
+        self.fps = fps
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._broken = False
+        self._next_slot = 0  # first slot on the fps grid not yet queued
+        self._last_slot = -1  # latest slot of any frame, dropped ones included
+        self._err_tail = collections.deque(maxlen=20)
+        try:
+            self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                          stderr=subprocess.PIPE)
+        except OSError:
+            self._proc = None
+            return
+        self._feeder = threading.Thread(target=self._feed, daemon=True)
+        self._feeder.start()
+        self._stderr = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr.start()
+
+    def isOpened(self) -> bool:
+        return self._proc is not None and not self._broken
+
+    def _drain_stderr(self):
+        for line in self._proc.stderr:
+            self._err_tail.append(line)
+
+    def _feed(self):
+        stdin = self._proc.stdin
+        prev = None
+        written = 0  # slots written so far
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._broken:
+                # keep draining so release() never blocks on a full queue
+                continue
+            buf, slot = item
+            t0 = time.perf_counter()
+            try:
+                # slots left empty by a stall or a dropped frame show the previous frame
+                while prev is not None and written < slot:
+                    stdin.write(prev)
+                    written += 1
+                    self.stats['frames_repeated'] += 1
+                if buf is None:
+                    continue  # padding only, see release()
+                stdin.write(buf)
+                written = max(written, slot) + 1
+            except (BrokenPipeError, OSError):
+                self._broken = True
+                continue
+            prev = buf
+            self.stats['write_blocked_s'] += time.perf_counter() - t0
+            self.stats['frames_written'] += 1
+
+    def write(self, frame, timestamp: float = None):
+        """Queue a frame captured ``timestamp`` seconds into the recording.
+
+        Without a timestamp the frame takes the next slot (even playback, as
+        timelapse mode wants). A frame whose slot is already taken is skipped,
+        and one that arrives while the encoder is too far behind is dropped;
+        either way the time it covered goes to its neighbours.
+        """
+        if not self.isOpened():
+            return
+        slot = self._next_slot if timestamp is None else int(round(timestamp * self.fps))
+        self._last_slot = max(self._last_slot, slot)
+        if slot < self._next_slot:
+            self.stats['frames_coalesced'] += 1
+            return
+        try:
+            self._queue.put_nowait((frame.tobytes(), slot))
+        except queue.Full:
+            self.stats['frames_dropped'] += 1
+            return
+        self._next_slot = slot + 1
+        depth = self._queue.qsize()
+        if depth > self.stats['queue_high_water']:
+            self.stats['queue_high_water'] = depth
+
+    def release(self) -> bool:
+        """Flush queued frames, wait for ffmpeg to finish and return success."""
+        if self._proc is None:
+            return False
+        t0 = time.perf_counter()
+        if self._last_slot >= self._next_slot:
+            # the last frames were dropped: hold the final one through their slots
+            self._queue.put((None, self._last_slot + 1))
+        self._queue.put(None)
+        self._feeder.join()
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        self._proc.wait()
+        self._stderr.join()
+        self.stats['encode_tail_s'] = time.perf_counter() - t0
+        self.stats['returncode'] = self._proc.returncode
+        err = b''.join(self._err_tail)
+        if self._proc.returncode != 0 and err:
+            self.stats['error'] = err.decode('utf-8', 'replace').strip()[-500:]
+        return self._proc.returncode == 0 and not self._broken
@@ -0,0 +1,146 @@
+"""Lazy thumbnails and contact sheets for recordings (GIF or MP4).
+
+Rendering runs on a small thread pool so callers (the Qt GUI thread in
+particular) only receive a ``Future``. Results are cached as PNG files next
+to the recording (``<name>.thumb.png``, ``<name>.sheet<N>.png``) and reused
+while they are newer than the recording, so repeat views are a stat call.
+For MP4 files frames are fetched by seeking to keyframes from the recording
+index instead of decoding the whole video.
+"""
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image
+
+try:
+    from sidecar import load_sidecar
+except ImportError:
+    from .sidecar import load_sidecar
+
+THUMB_SIZE = (320, 320)
+TILE_WIDTH = 240
+
+
+def thumb_path(path: str) -> str:
+    return os.path.splitext(path)[0] + '.thumb.png'
+
+
+def sheet_path(path: str, count: int) -> str:
+    return os.path.splitext(path)[0] + f'.sheet{count}.png'
+
+
+def _fresh(cached: str, source: str) -> bool:
+    try:
+        return os.path.getmtime(cached) >= os.path.getmtime(source)
+    except OSError:
+        return False
+
+
+def _save_png(im: Image.Image, dest: str) -> str:
+    # per-thread temporary name: the library may render the same thumbnail
+    # while the preview pool does
+    tmp = f'{dest}.{os.getpid()}-{threading.get_ident()}.tmp'
+    im.save(tmp, 'PNG')
+    os.replace(tmp, dest)
+    return dest
+
+
+def _video_frames(path: str, count: int) -> List[Image.Image]:
+    import cv2
+    cap = cv2.VideoCapture(path)
+    try:
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        if total <= 0:
+            return []
+        targets = np.linspace(0, total - 1, num=min(count, total)).astype(int)
+        index = load_sidecar(path)
+        keyframes = sorted(set((index or {}).get('keyframes') or []))
+        if keyframes:
+            # Snap each target to the nearest keyframe so every seek decodes one frame
+            kf = np.array(keyframes)
+            targets = [int(kf[np.abs(kf - t).argmin()]) for t in targets]
+            if len(set(targets)) < len(targets) and len(keyframes) >= len(targets):
+                targets = [keyframes[int(i)] for i in np.linspace(0, len(keyframes) - 1, num=len(targets))]
+        out = []
+        for idx in targets:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+            ok, frame = cap.read()
+            if ok:
+                out.append(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+        return out
+    finally:
+        cap.release()
+
+
+def _gif_frames(path: str, count: int) -> List[Image.Image]:
+    with Image.open(path) as im:
+        total = getattr(im, 'n_frames', 1)
+        out = []
+        for idx in np.linspace(0, total - 1, num=min(count, total)).astype(int):
+            im.seek(int(idx))
+            out.append(im.convert('RGB'))
+        return out
+
+
+def extract_frames(path: str, count: int) -> List[Image.Image]:
+    """Return up to ``count`` evenly spaced frames of a GIF or video."""
+    if path.lower().endswith('.gif'):
+        return _gif_frames(path, count)
+    return _video_frames(path, count)
+
+
+def render_thumbnail(path: str, size: Tuple[int, int] = THUMB_SIZE) -> str:
+    """Render (or reuse) the first-frame thumbnail of ``path`` and return its path."""
+    dest = thumb_path(path)
+    if _fresh(dest, path):
+        return dest
+    frames = extract_frames(path, 1)
+    if not frames:
+        raise ValueError(f'no frames in {path}')
+    im = frames[0]
+    im.thumbnail(size)
+    return _save_png(im, dest)
+
+
+def render_contact_sheet(path: str, count: int = 9, tile_width: int = TILE_WIDTH) -> str:
+    """Render (or reuse) a grid of ``count`` evenly spaced frames and return its path."""
+    dest = sheet_path(path, count)
+    if _fresh(dest, path):
+        return dest
+    frames = extract_frames(path, count)
+    if not frames:
+        raise ValueError(f'no frames in {path}')
+    w, h = frames[0].size
+    tile_h = max(1, int(round(h * tile_width / float(w))))
+    cols = int(np.ceil(np.sqrt(len(frames))))
+    rows = int(np.ceil(len(frames) / float(cols)))
+    sheet = Image.new('RGB', (cols * tile_width, rows * tile_h), (32, 32, 32))
+    for i, f in enumerate(frames):
+        sheet.paste(f.resize((tile_width, tile_h), Image.BILINEAR), ((i % cols) * tile_width, (i // cols) * tile_h))
+    return _save_png(sheet, dest)
+
+
+class PreviewService:
+    """Render previews off the calling thread; every method returns a Future."""
+
+    def __init__(self, max_workers: int = 2):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='preview')
+
+    def _submit(self, cached: str, source: str, fn, *args) -> Future:
+        if _fresh(cached, source):
+            done = Future()
+            done.set_result(cached)
+            return done
+        return self._pool.submit(fn, source, *args)
+
+    def thumbnail(self, path: str, size: Tuple[int, int] = THUMB_SIZE) -> Future:
+        return self._submit(thumb_path(path), path, render_thumbnail, size)
+
+    def contact_sheet(self, path: str, count: int = 9, tile_width: int = TILE_WIDTH) -> Future:
+        return self._submit(sheet_path(path, count), path, render_contact_sheet, count, tile_width)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
@@ -7,6 +7,26 @@ import mss
 import numpy as np
 import cv2
 
+try:
+    from backends import ffmpeg_exe
+    from decimate import ChangeTrigger
+    from monitors import topology
+    from pipe_writer import FfmpegPipeWriter, is_streamable
+    from sidecar import write_sidecar
+    from utils import part_path, publish
+except ImportError:
+    from .backends import ffmpeg_exe
+    from .decimate import ChangeTrigger
+    from .monitors import topology
+    from .pipe_writer import FfmpegPipeWriter, is_streamable
+    from .sidecar import write_sidecar
+    from .utils import part_path, publish
+
+# timelapse defaults: poll rate (seconds), change threshold (gray levels), forced commit (seconds)
+TIMELAPSE_POLL = 1.0
+TIMELAPSE_THRESHOLD = 4.0
+TIMELAPSE_MAX_INTERVAL = 60.0
+
 
 class ScreenRecorder:
     def __init__(self):
@@ -15,6 +35,23 @@ class ScreenRecorder:
         self._out_path = None
         self._rect = None
         self._fps = 10
+        self._ok = True
+        self._timelapse = None
+        self.last_stats = None
+        self.last_error = None
+
+    @staticmethod
+    def can_stream(out_path: str) -> bool:
+        """True if ``out_path`` can be encoded live by piping frames into ffmpeg."""
+        return is_streamable(out_path) and ffmpeg_exe() is not None
+
+    def _open_writer(self, out_path: str, fps: int, size: Tuple[int, int]):
+        # GIF/WebP targets are encoded by ffmpeg concurrently with capture;
+        # everything else goes through an mp4v file for later conversion.
+        if is_streamable(out_path):
+            return FfmpegPipeWriter(out_path, fps, size, pix_fmt='bgra', ffmpeg=ffmpeg_exe())
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        return cv2.VideoWriter(out_path, fourcc, fps, size)
 
     def _capture_loop(self, rect: Tuple[int, int, int, int], fps: int, out_path: str):
         left, top, width, height = rect
@@ -28,38 +65,107 @@ class ScreenRecorder:
                 f.write(f"time: {time.time()}\n")
                 f.write(f"requested_rect: {rect}\n")
                 try:
-                    sct_tmp = mss.mss()
-                    mons = sct_tmp.monitors
-                    f.write(f"mss_monitors: {json.dumps(mons)}\n")
+                    f.write(f"mss_monitors: {json.dumps(topology().monitors)}\n")
                 except Exception as me:
                     f.write(f"mss_monitors_error: {me}\n")
                 f.write('\n')
         except Exception:
             pass
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        writer = cv2.VideoWriter(out_path, fourcc, fps, (width, height))
-        sct = mss.mss()
+        # keep the grab inside the virtual desktop (mss fails on out-of-bounds rects)
+        try:
+            left, top, width, height = topology().clamp((left, top, width, height))
+        except Exception:
+            pass
+        # the recording is written under a .part name and renamed when complete
+        part = part_path(out_path)
+        writer = self._open_writer(part, fps, (width, height))
+        takes_bgra = isinstance(writer, FfmpegPipeWriter)
         interval = 1.0 / fps
+        # In timelapse mode the screen is polled slowly and only frames that
+        # changed enough (or are overdue) are written; the output plays them
+        # back at ``fps``, so its length follows the amount of change.
+        trigger = None
+        if self._timelapse is not None:
+            trigger = ChangeTrigger(self._timelapse['threshold'], self._timelapse['max_interval'])
+            interval = self._timelapse['poll']
+        # real capture time of each written frame, relative to the first one
+        timestamps = []
+        t_start = None
+        sct = None
+        failed = False
         try:
+            sct = mss.mss()
             while not self._stop_event.is_set():
                 t0 = time.time()
+                if t_start is None:
+                    t_start = t0
                 img = sct.grab({'left': left, 'top': top, 'width': width, 'height': height})
                 arr = np.array(img)  # BGRA
-                # convert BGRA to BGR
-                if arr.shape[2] == 4:
+                if trigger is not None and not trigger.check(arr[..., 2::-1], t0):
+                    self._stop_event.wait(max(0.0, interval - (time.time() - t0)))
+                    continue
+                # convert BGRA to BGR (the ffmpeg pipe takes BGRA as-is)
+                if arr.shape[2] == 4 and not takes_bgra:
                     arr = cv2.cvtColor(arr, cv2.COLOR_BGRA2BGR)
-                writer.write(arr)
+                if takes_bgra and trigger is None:
+                    # ffmpeg fills slots missed by a slow grab with the previous frame
+                    writer.write(arr, t0 - t_start)
+                else:
+                    writer.write(arr)
+                timestamps.append(t0 - t_start)
                 dt = time.time() - t0
                 to_sleep = interval - dt
                 if to_sleep > 0:
-                    time.sleep(to_sleep)
+                    if trigger is not None:
+                        self._stop_event.wait(to_sleep)  # long polls must not delay stop()
+                    else:
+                        time.sleep(to_sleep)
+        except Exception as e:
+            # a failed grab (or mss setup) must not publish a truncated or empty file
+            failed = True
+            self.last_error = f'{type(e).__name__}: {e}'
         finally:
-            writer.release()
+            if sct is not None:
+                try:
+                    sct.close()
+                except Exception:
+                    pass
+            ok = writer.release()
+            if takes_bgra:
+                self._ok = bool(ok)
+                self.last_stats = dict(writer.stats)
+            if trigger is not None:
+                self.last_stats = dict(self.last_stats or {}, **trigger.stats(),
+                                       captured_at=[round(t, 3) for t in timestamps])
+                # committed frames play back evenly at ``fps``, not at capture time
+                timestamps = [i / float(fps) for i in range(len(timestamps))]
+            if not takes_bgra:
+                self._ok = bool(timestamps)
+            if failed:
+                self._ok = False
+            if self._ok and not takes_bgra:
+                write_sidecar(out_path, timestamps, fps)
+            self._ok = publish(part, out_path, self._ok)
+
+    def start(self, rect: Tuple[int, int, int, int], fps: int = 10, out_path: str = None,
+              timelapse: dict = None):
+        """Start capturing ``rect`` to ``out_path``.
 
-    def start(self, rect: Tuple[int, int, int, int], fps: int = 10, out_path: str = None):
+        ``timelapse`` switches to change-triggered capture; it may set
+        ``poll`` (seconds between polls), ``threshold`` (mean gray-level
+        change that commits a frame) and ``max_interval`` (seconds after which
+        a frame is committed regardless). Committed frames play at ``fps``.
+        """
         if self._thread and self._thread.is_alive():
             return
         self._stop_event.clear()
+        self._ok = True
+        self.last_stats = None
+        self.last_error = None
+        self._timelapse = None
+        if timelapse is not None:
+            self._timelapse = dict({'poll': TIMELAPSE_POLL, 'threshold': TIMELAPSE_THRESHOLD,
+                                    'max_interval': TIMELAPSE_MAX_INTERVAL}, **timelapse)
         self._rect = rect
         self._fps = fps
         self._out_path = out_path or 'video/out.mp4'
@@ -71,4 +177,6 @@ class ScreenRecorder:
             return None
         self._stop_event.set()
         self._thread.join()
+        if not self._ok:
+            return None
         return self._out_path
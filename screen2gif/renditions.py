@@ -0,0 +1,176 @@
+"""Several renditions of one recording from a single decode pass.
+
+The source is decoded once; every (frame, duration_ms) pair is handed to one
+branch per rendition over a small bounded queue. Each branch runs on its own
+thread and resizes, dithers, quantizes and streams its frames into a
+``GifWriter`` (or, for ``.png`` targets, keeps only the first frame as a still
+thumbnail). The palette is built once from the sampled source frames and
+shared, since downscaling does not introduce new colours. OpenCV resizing,
+the NumPy palette lookup and Pillow's LZW compression release the GIL, so
+branches overlap with each other and with decoding.
+"""
+import queue
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+try:
+    import dither as _dither
+    from encoder import build_palette, native_timing, palette_lut, quantize, read_frames, resample, sample_frames
+    from gif_writer import GifWriter
+    from utils import part_path, publish
+except ImportError:
+    from . import dither as _dither
+    from .encoder import build_palette, native_timing, palette_lut, quantize, read_frames, resample, sample_frames
+    from .gif_writer import GifWriter
+    from .utils import part_path, publish
+
+_QUEUE_SIZE = 8
+_DONE = object()
+
+
+class Rendition:
+    """One output of a multi-rendition conversion.
+
+    Size is given either as ``scale`` (relative to the source) or as
+    ``max_width``/``max_height`` bounds; aspect ratio is always kept. A
+    ``path`` ending in ``.png`` produces a still thumbnail of the first frame.
+    """
+
+    def __init__(self, path: str, scale: float = 1.0, max_width: int = None, max_height: int = None,
+                 dither: str = 'none', dither_strength: float = _dither.DEFAULT_STRENGTH):
+        if dither not in _dither.DITHER_MODES:
+            raise ValueError(f'unknown dither mode: {dither}')
+        self.path = path
+        self.scale = scale
+        self.max_width = max_width
+        self.max_height = max_height
+        self.dither = dither
+        self.dither_strength = dither_strength
+
+    @property
+    def is_still(self) -> bool:
+        return self.path.lower().endswith('.png')
+
+    def params(self) -> dict:
+        """Settings that affect the output, for cache keys."""
+        return {'scale': self.scale, 'max_width': self.max_width, 'max_height': self.max_height,
+                'dither': self.dither, 'dither_strength': self.dither_strength,
+                'format': 'png' if self.is_still else 'gif'}
+
+    def size_for(self, w: int, h: int):
+        s = self.scale
+        if self.max_width:
+            s = min(s, self.max_width / float(w))
+        if self.max_height:
+            s = min(s, self.max_height / float(h))
+        return max(1, int(round(w * s))), max(1, int(round(h * s)))
+
+
+def _resize(frame: np.ndarray, size) -> np.ndarray:
+    if (frame.shape[1], frame.shape[0]) == tuple(size):
+        return frame
+    try:
+        import cv2
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    except ImportError:
+        return np.asarray(Image.fromarray(frame).resize(size, Image.BILINEAR))
+
+
+class _Branch(threading.Thread):
+    def __init__(self, rendition: Rendition, lut: np.ndarray, palette: np.ndarray):
+        super().__init__(daemon=True)
+        self.rendition = rendition
+        self.lut = lut
+        self.palette = palette
+        self.queue = queue.Queue(maxsize=_QUEUE_SIZE)
+        self.error = None
+        self.frames = 0
+        self.busy_s = 0.0
+        self.ok = False
+
+    def run(self):
+        r = self.rendition
+        # written under a .part name and renamed once complete
+        part = part_path(r.path)
+        writer = None
+        done = False
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _DONE:
+                    done = True
+                    break
+                if self.error is not None or (r.is_still and self.frames):
+                    continue  # keep draining so the producer never blocks
+                frame, duration_ms = item
+                t0 = time.perf_counter()
+                frame = _resize(frame, r.size_for(frame.shape[1], frame.shape[0]))
+                if r.is_still:
+                    Image.fromarray(np.ascontiguousarray(frame)).save(part, 'PNG')
+                else:
+                    if writer is None:
+                        writer = GifWriter(part, (frame.shape[1], frame.shape[0]), self.palette)
+                    frame = _dither.apply(frame, r.dither, r.dither_strength)
+                    writer.write(quantize(frame, self.lut), duration_ms)
+                self.busy_s += time.perf_counter() - t0
+                self.frames += 1
+            if writer is not None:
+                writer.close()
+                self.ok = writer.frames_written > 0
+            else:
+                self.ok = r.is_still and self.frames > 0
+            self.ok = publish(part, r.path, self.ok)
+        except Exception as e:
+            self.error = e
+            if writer is not None:
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+            publish(part, r.path, False)
+            # if _DONE was already consumed (e.g. close() failed) the producer has finished
+            while not done and self.queue.get() is not _DONE:
+                pass
+
+
+def encode_renditions(src_path: str, renditions: List[Rendition], fps: int = 10, vfr: bool = False,
+                      start: float = None, end: float = None, crop=None,
+                      stats: Optional[dict] = None) -> List[bool]:
+    """Decode ``src_path`` once and write every rendition; returns per-rendition success.
+
+    ``fps``/``vfr``/``start``/``end``/``crop`` have the same meaning as for
+    ``encoder.encode_gif`` and apply to all renditions alike.
+    """
+    if not renditions:
+        return []
+    samples = sample_frames(src_path, start=start, end=end, crop=crop)
+    if not samples:
+        return [False] * len(renditions)
+    palette = build_palette(samples)
+    lut = palette_lut(palette)
+    branches = [_Branch(r, lut, palette) for r in renditions]
+    for b in branches:
+        b.start()
+    timing = native_timing if vfr else resample
+    decoded = 0
+    t0 = time.perf_counter()
+    try:
+        for item in timing(read_frames(src_path, start=start, end=end, crop=crop), fps):
+            decoded += 1
+            for b in branches:
+                b.queue.put(item)
+    finally:
+        for b in branches:
+            b.queue.put(_DONE)
+        for b in branches:
+            b.join()
+    if stats is not None:
+        stats['frames_decoded'] = decoded
+        stats['wall_s'] = time.perf_counter() - t0
+        stats['renditions'] = [{'path': b.rendition.path, 'frames': b.frames, 'busy_s': b.busy_s,
+                                'error': repr(b.error) if b.error else None} for b in branches]
+    return [b.ok for b in branches]
@@ -6,29 +6,126 @@ Usage:
 import time
 import argparse
 
-import imageio
+import mss
 import numpy as np
-import pyautogui
 
+from encoder import build_palette, palette_lut, quantize
+from gif_writer import GifWriter, TRANSPARENT_INDEX
+from memory import RssMonitor, rss_bytes
+from utils import part_path, publish
 
-def capture_to_gif(duration: float, fps: int, output: str, region=None):
-    frames = []
+# palette entries reserved for a coarse RGB cube so colours that only show up
+# after the first frame still have a reasonably close match
+_CUBE_LEVELS = 4
+# how often the palette is checked against the current frame, and how much
+# worse (mean per-channel error) it may fit than when it was built
+_PALETTE_CHECK_S = 2.0
+_PALETTE_DRIFT = 8.0
+
+
+def _stream_palette(first: np.ndarray) -> np.ndarray:
+    levels = np.linspace(0, 255, _CUBE_LEVELS).astype(np.uint8)
+    cube = np.stack(np.meshgrid(levels, levels, levels, indexing='ij'), axis=-1).reshape(-1, 3)
+    own = build_palette([first], colors=TRANSPARENT_INDEX - len(cube))
+    return np.concatenate([own, cube])
+
+
+def _palette_error(rgb: np.ndarray, palette: np.ndarray, lut: np.ndarray) -> float:
+    """Mean per-channel error of quantizing a subsample of ``rgb`` with ``palette``."""
+    sample = rgb[::8, ::8]
+    mapped = palette[np.minimum(quantize(sample, lut), len(palette) - 1)]
+    return float(np.abs(mapped.astype(np.int16) - sample).mean())
+
+
+def capture_to_gif(duration: float, fps: int, output: str, region=None) -> dict:
+    """Capture the screen straight into ``output`` and return capture stats.
+
+    Frames are grabbed with mss on a fixed deadline schedule (``start + n /
+    fps``), so time spent grabbing and encoding does not add to the frame
+    interval. A deadline that has already passed is skipped and counted as
+    dropped instead of shifting every later frame. Each frame is quantized
+    and written to an open ``GifWriter`` as soon as the next one arrives (its
+    delay is the real time between the two), so memory stays flat however
+    long the capture runs. The palette is built from the first frame plus a
+    coarse colour cube; every ``_PALETTE_CHECK_S`` it is compared with the
+    current frame and rebuilt from it (as a local colour table) once it fits
+    noticeably worse than it did at the start.
+    """
     interval = 1.0 / fps
-    end = time.time() + duration
-    try:
-        while time.time() < end:
-            img = pyautogui.screenshot(region=region)
-            frames.append(np.array(img))
-            time.sleep(interval)
-    except KeyboardInterrupt:
-        print("Capture interrupted by user")
-
-    if not frames:
-        raise RuntimeError("No frames captured")
+    stats = {'frames': 0, 'dropped': 0, 'elapsed_s': 0.0, 'fps': 0.0}
+    writer = None
+    palette = lut = None
+    base_error = checked = 0.0
+    pending = None  # (indexed, capture_time) waiting for its successor
+    part = part_path(output)  # renamed to ``output`` once the GIF is complete
+    with mss.mss() as sct, RssMonitor(label='capture_to_gif') as mon:
+        if region:
+            left, top, width, height = region
+            box = {'left': left, 'top': top, 'width': width, 'height': height}
+        else:
+            box = sct.monitors[1]
+        start = time.perf_counter()
+        end = start + duration
+        slot = 0
+        last_report = start
+        try:
+            while True:
+                deadline = start + slot * interval
+                if deadline >= end:
+                    break
+                now = time.perf_counter()
+                if now < deadline:
+                    time.sleep(deadline - now)
+                elif now - deadline >= interval:
+                    # fell behind by whole intervals: skip them rather than burst
+                    missed = int((now - deadline) / interval)
+                    stats['dropped'] += missed
+                    slot += missed
+                    continue
+                t = time.perf_counter()
+                rgb = np.asarray(sct.grab(box))[..., 2::-1]
+                refresh = False
+                if writer is None:
+                    palette = _stream_palette(np.ascontiguousarray(rgb))
+                    lut = palette_lut(palette)
+                    writer = GifWriter(part, (rgb.shape[1], rgb.shape[0]), palette)
+                    base_error, checked = _palette_error(rgb, palette, lut), t
+                elif t - checked >= _PALETTE_CHECK_S:
+                    checked = t
+                    refresh = _palette_error(rgb, palette, lut) > base_error + _PALETTE_DRIFT
+                if pending is not None:
+                    writer.write(pending[0], (t - pending[1]) * 1000.0)
+                if refresh:
+                    palette = _stream_palette(np.ascontiguousarray(rgb))
+                    lut = palette_lut(palette)
+                    writer.set_palette(palette)
+                    base_error = _palette_error(rgb, palette, lut)
+                pending = (quantize(rgb, lut), t)
+                stats['frames'] += 1
+                slot += 1
+                if t - last_report >= 5.0:
+                    print(f"{stats['frames']} frames, {stats['dropped']} dropped, RSS {rss_bytes() / 1048576:.0f} MB")
+                    last_report = t
+        except KeyboardInterrupt:
+            print("Capture interrupted by user")
+        finally:
+            # the schedule covers whole intervals, up to the last slot reached
+            stats['elapsed_s'] = min(duration, max(time.perf_counter() - start, slot * interval))
+            if writer is not None:
+                if pending is not None:
+                    writer.write(pending[0], interval * 1000.0)
+                writer.close()
+            publish(part, output, writer is not None and writer.frames_written > 0)
+        stats['peak_rss'] = mon.peak
 
-    # Save as animated GIF
-    imageio.mimsave(output, frames, fps=fps)
-    print(f"Saved {len(frames)} frames to {output}")
+    if not stats['frames']:
+        raise RuntimeError("No frames captured")
+    stats['fps'] = stats['frames'] / stats['elapsed_s'] if stats['elapsed_s'] else 0.0
+    stats['frames_written'] = writer.frames_written
+    stats['palettes'] = writer.palettes
+    print(f"Saved {stats['frames']} frames to {output}: {stats['fps']:.2f} fps achieved "
+          f"(target {fps}), {stats['dropped']} dropped, peak RSS {stats['peak_rss'] / 1048576:.0f} MB")
+    return stats
 
 
 def main():
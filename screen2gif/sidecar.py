@@ -0,0 +1,111 @@
+"""Per-recording sidecar index: frame timestamps and keyframe positions.
+
+The mp4v container written by OpenCV is constant-frame-rate, so frames the
+recorder dropped (or captured late) are invisible to the converter. The
+recorder therefore stores the real capture time of each written frame next
+to the video as ``<name>.frames.json``, together with the indices of the
+frames the encoder emitted as keyframes. The converter uses the index to map
+a trim range to frame numbers and to seek to the nearest preceding keyframe
+without decoding the discarded part of the recording.
+"""
+import bisect
+import json
+import os
+import re
+import subprocess
+from typing import List, Optional, Tuple
+
+SIDECAR_SUFFIX = '.frames.json'
+# OpenCV's FFmpeg writer emits an intra frame every 12 frames (gop_size = 12)
+KEYFRAME_INTERVAL = 12
+
+
+def sidecar_path(video_path: str) -> str:
+    return os.path.splitext(video_path)[0] + SIDECAR_SUFFIX
+
+
+def write_sidecar(video_path: str, timestamps: List[float], fps: float,
+                  keyframes: Optional[List[int]] = None) -> Optional[str]:
+    """Write frame timestamps (seconds from the first frame) for ``video_path``.
+
+    ``keyframes`` defaults to every ``KEYFRAME_INTERVAL``-th frame, matching
+    what OpenCV's mp4v writer produces.
+    """
+    path = sidecar_path(video_path)
+    if keyframes is None:
+        keyframes = list(range(0, len(timestamps), KEYFRAME_INTERVAL))
+    data = {
+        'version': 2,
+        'fps': fps,
+        'timestamps': [round(t, 6) for t in timestamps],
+        'keyframes': keyframes,
+    }
+    try:
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+        return path
+    except OSError:
+        return None
+
+
+def load_sidecar(video_path: str) -> Optional[dict]:
+    try:
+        with open(sidecar_path(video_path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data.get('timestamps'), list):
+            return None
+        data.setdefault('keyframes', [0])
+        return data
+    except (OSError, ValueError):
+        return None
+
+
+def build_index(video_path: str, ffmpeg: str = None) -> Optional[dict]:
+    """Create a sidecar for a video recorded without one.
+
+    Frame timestamps come from a full ``showinfo`` pass of ffmpeg, which also
+    flags the keyframes. This decodes the file once; the result is cached
+    next to it so later trims are cheap.
+    """
+    if ffmpeg is None:
+        try:
+            from backends import ffmpeg_exe
+        except ImportError:
+            from .backends import ffmpeg_exe
+        ffmpeg = ffmpeg_exe()
+    if not ffmpeg:
+        return None
+    cmd = [ffmpeg, '-hide_banner', '-nostats', '-i', video_path, '-map', '0:v:0',
+           '-vf', 'showinfo', '-f', 'null', '-']
+    try:
+        err = subprocess.run(cmd, capture_output=True, text=True).stderr
+    except OSError:
+        return None
+    timestamps, keyframes = [], []
+    for m in re.finditer(r'pts_time:\s*([-\d.]+).*?iskey:\s*(\d)', err):
+        if m.group(2) == '1':
+            keyframes.append(len(timestamps))
+        timestamps.append(float(m.group(1)))
+    if not timestamps:
+        return None
+    t0 = timestamps[0]
+    fps_m = re.search(r'(\d+(?:\.\d+)?) fps', err)
+    write_sidecar(video_path, [t - t0 for t in timestamps],
+                  float(fps_m.group(1)) if fps_m else 0.0, keyframes=keyframes or [0])
+    return load_sidecar(video_path)
+
+
+def frame_range(index: dict, start: Optional[float], end: Optional[float]) -> Tuple[int, int]:
+    """Return [first, stop) frame indices covering ``start``..``end`` seconds."""
+    ts = index['timestamps']
+    first = 0 if start is None else bisect.bisect_left(ts, start - 1e-6)
+    stop = len(ts) if end is None else bisect.bisect_left(ts, end - 1e-6)
+    return first, max(first, stop)
+
+
+def keyframe_at_or_before(index: dict, frame: int) -> int:
+    kfs = index.get('keyframes') or [0]
+    i = bisect.bisect_right(kfs, frame) - 1
+    return kfs[i] if i >= 0 else 0
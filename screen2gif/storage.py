@@ -0,0 +1,349 @@
+"""Disk quota and retention for the scratch, video/, gif/ and logs/ folders.
+
+``StorageManager`` keeps a size index of the output folders that is built by
+one directory scan when the manager starts and is then updated as recordings
+finish (``recording_finished``), so enforcing the quota never walks the tree
+again. Cleanup runs on a background thread in small batches:
+
+* intermediate MP4s (and their sidecars) are deleted once their GIF has been
+  converted, unless ``SCREEN2GIF_KEEP_INTERMEDIATES`` is set;
+* files older than ``SCREEN2GIF_MAX_AGE_DAYS`` are deleted (0 = keep);
+* while the folders exceed ``SCREEN2GIF_QUOTA_MB`` (0 = no quota) the least
+  recently used files go first, intermediates before final outputs;
+* logs larger than ``log_max_bytes`` are rotated to ``name.1`` .. ``name.N``.
+
+Both the age limit and the quota are off by default, so finished GIFs are
+only ever deleted when the user has asked for it. Only files named the way
+the app names them (timestamped recordings, their ``.part`` files, sidecars
+and previews) are indexed or deleted; anything else in these folders is left
+alone. Files modified in the last ``GRACE_SECONDS`` are never evicted, so a
+recording that is still being written is safe.
+
+Usage:
+    python storage.py             # print usage and run one cleanup pass
+    python storage.py --dry-run   # only show what would be deleted
+"""
+import argparse
+import os
+import queue
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from utils import scratch_dirs
+except ImportError:
+    from .utils import scratch_dirs
+
+DEFAULT_QUOTA = int(os.environ.get('SCREEN2GIF_QUOTA_MB', '0')) * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = float(os.environ.get('SCREEN2GIF_MAX_AGE_DAYS', '0'))
+KEEP_INTERMEDIATES = os.environ.get('SCREEN2GIF_KEEP_INTERMEDIATES', '') not in ('', '0')
+GRACE_SECONDS = 60.0
+_BATCH = 32
+# eviction order: intermediates first
+_FOLDERS = ('video', 'gif')
+# utils.timestamped_filename / scratch_filename names and their companions
+_MANAGED = re.compile(r'\d{8}_\d{6}_\d{3}(_[0-9a-f]+)?(\.part)?'
+                      r'(\.(mp4|gif|webp)|\.frames\.json|\.thumb\.png|\.sheet\d+\.png)')
+
+
+class StorageManager:
+    def __init__(self, base_dir: str = None, quota_bytes: int = DEFAULT_QUOTA,
+                 max_age_days: float = DEFAULT_MAX_AGE_DAYS, keep_intermediates: bool = KEEP_INTERMEDIATES,
+                 log_max_bytes: int = 1024 * 1024, log_backups: int = 3, scratch_setting: str = None):
+        """``scratch_setting`` (a ``SCREEN2GIF_SCRATCH`` value) adds the scratch
+        directories; they are always included when ``base_dir`` is None."""
+        base = base_dir or os.path.dirname(os.path.abspath(__file__))
+        self.dirs = [os.path.abspath(os.path.join(base, d)) for d in _FOLDERS]
+        self.scratch_setting = scratch_setting
+        self._with_scratch = base_dir is None or scratch_setting is not None
+        self.log_dir = os.path.join(base, 'logs')
+        self.quota_bytes = quota_bytes
+        self.max_age_days = max_age_days
+        self.keep_intermediates = keep_intermediates
+        self.log_max_bytes = log_max_bytes
+        self.log_backups = log_backups
+        self._lock = threading.Lock()
+        self._files: Dict[str, Tuple[int, float]] = {}  # path -> (bytes, last use)
+        self._total = 0
+        self._scanned = False
+        self._events = queue.Queue()
+        self._thread = None
+        self.deleted = 0
+        self.freed = 0
+
+    # -- size index ----------------------------------------------------------------
+    def _dirs(self) -> List[str]:
+        """Managed folders, scratch first (evicted first).
+
+        Scratch is resolved on every call: with the "auto" setting it moves
+        between tmpfs and video/ as free memory changes, and intermediates in
+        any of those places must still be released.
+        """
+        if not self._with_scratch:
+            return self.dirs
+        scratch = [os.path.abspath(d) for d in scratch_dirs(self.scratch_setting)]
+        return [d for d in scratch if d not in self.dirs] + self.dirs
+
+    def _owned(self, path: str) -> bool:
+        d, name = os.path.split(os.path.abspath(path))
+        return _MANAGED.fullmatch(name) is not None and d in self._dirs()
+
+    def _scan(self):
+        files = {}
+        for d in self._dirs():
+            try:
+                entries = list(os.scandir(d))
+            except OSError:
+                continue
+            for e in entries:
+                if not _MANAGED.fullmatch(e.name):
+                    continue
+                try:
+                    if e.is_file():
+                        st = e.stat()
+                        files[e.path] = (st.st_size, max(st.st_atime, st.st_mtime))
+                except OSError:
+                    continue
+        with self._lock:
+            self._files = files
+            self._total = sum(s for s, _ in files.values())
+            self._scanned = True
+
+    def note_added(self, path: str):
+        path = os.path.abspath(path)
+        if not self._owned(path):
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            old = self._files.get(path)
+            self._total += st.st_size - (old[0] if old else 0)
+            self._files[path] = (st.st_size, max(st.st_atime, st.st_mtime))
+
+    def _forget(self, path: str) -> int:
+        with self._lock:
+            old = self._files.pop(path, None)
+            if old:
+                self._total -= old[0]
+            return old[0] if old else 0
+
+    def usage(self) -> dict:
+        with self._lock:
+            return {'bytes': self._total, 'files': len(self._files), 'quota_bytes': self.quota_bytes,
+                    'deleted': self.deleted, 'freed': self.freed, 'scanned': self._scanned}
+
+    # -- background worker ---------------------------------------------------------
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='storage', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        self._scan()
+        while True:
+            item = self._events.get()
+            if item is None:
+                return
+            kind, arg = item
+            try:
+                if kind == 'release':
+                    self._delete_intermediate(arg)
+                more = self.collect_once()
+            except Exception:
+                more = False
+            if more and self._events.empty():
+                # still over quota: continue with the next batch after a pause
+                time.sleep(0.05)
+                self._events.put(('collect', None))
+
+    def collect(self):
+        """Schedule an incremental cleanup pass."""
+        self.start()
+        self._events.put(('collect', None))
+
+    def recording_finished(self, output: str, intermediate: Optional[str] = None):
+        """Account for a new output; delete its ``intermediate`` MP4 unless intermediates are kept."""
+        self.start()
+        self.note_added(output)
+        self._events.put(('release', intermediate) if intermediate else ('collect', None))
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is not None:
+            self._events.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    # -- policies ------------------------------------------------------------------
+    def _companions(self, path: str) -> List[str]:
+        """Sidecar and preview files that belong to a media file."""
+        stem = os.path.splitext(path)[0]
+        with self._lock:
+            out = {p for p in self._files if p != path and p.startswith(stem + '.')
+                   and p.endswith(('.frames.json', '.png'))}
+        # the sidecar and thumbnail may be newer than the index
+        out.update(p for p in (stem + '.frames.json', stem + '.thumb.png') if os.path.exists(p) and self._owned(p))
+        return sorted(out)
+
+    def _remove(self, path: str) -> bool:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            self._forget(path)
+            return False
+        freed = self._forget(path) or size
+        self.deleted += 1
+        self.freed += freed
+        return True
+
+    def _delete(self, path: str, dry_run: bool = False) -> bool:
+        """Delete a media file together with its companions and library row."""
+        if not path.lower().endswith(('.gif', '.mp4', '.webp')):
+            return False if dry_run else self._remove(path)
+        if dry_run:
+            print(f'would delete {path}')
+            return True
+        ok = self._remove(path)
+        for extra in self._companions(path):
+            self._remove(extra)
+        try:
+            try:
+                import library
+            except ImportError:
+                from . import library
+            # only touch an index that exists; never create one here
+            if os.path.exists(library.DEFAULT_DB):
+                library.default_library().remove(path)
+        except Exception:
+            pass
+        return ok
+
+    def _delete_intermediate(self, mp4_path: str):
+        mp4_path = os.path.abspath(mp4_path)
+        if not self._owned(mp4_path) or not os.path.isfile(mp4_path):
+            return
+        if self.keep_intermediates:
+            # kept, but still counted: the quota may evict it later
+            self.note_added(mp4_path)
+            return
+        self._delete(mp4_path)
+
+    def _candidates(self, now: float) -> List[str]:
+        with self._lock:
+            items = [(p, used) for p, (_, used) in self._files.items()]
+        rank = {d: i for i, d in enumerate(self._dirs())}
+        # video/ before gif/, then least recently used first
+        items.sort(key=lambda it: (rank.get(os.path.dirname(it[0]), 0), it[1]))
+        return [p for p, used in items if now - used >= GRACE_SECONDS]
+
+    def collect_once(self, dry_run: bool = False) -> bool:
+        """Run one bounded cleanup batch; returns True if more work remains."""
+        if not self._scanned:
+            self._scan()
+        now = time.time()
+        budget = _BATCH
+        if self.max_age_days > 0:
+            cutoff = now - self.max_age_days * 86400
+            with self._lock:
+                old = [p for p, (_, used) in self._files.items() if used < cutoff]
+            for p in old[:budget]:
+                self._delete(p, dry_run)
+            budget -= min(len(old), budget)
+        if budget and 0 < self.quota_bytes < self._total:
+            projected = self._total
+            for p in self._candidates(now):
+                if projected <= self.quota_bytes or not budget:
+                    break
+                with self._lock:
+                    size = self._files.get(p, (0, 0))[0]
+                if p not in self._files:
+                    continue  # removed as a companion of an earlier victim
+                if self._delete(p, dry_run):
+                    projected -= size
+                budget -= 1
+        self.rotate_logs(dry_run)
+        return budget == 0 and not dry_run
+
+    def rotate_logs(self, dry_run: bool = False):
+        try:
+            entries = list(os.scandir(self.log_dir))
+        except OSError:
+            return
+        for e in entries:
+            name = e.name
+            if name.rsplit('.', 1)[-1].isdigit():
+                continue
+            try:
+                if not e.is_file() or e.stat().st_size <= self.log_max_bytes:
+                    continue
+            except OSError:
+                continue
+            if dry_run:
+                print(f'would rotate {e.path}')
+                continue
+            try:
+                for i in range(self.log_backups - 1, 0, -1):
+                    src = f'{e.path}.{i}'
+                    if os.path.exists(src):
+                        os.replace(src, f'{e.path}.{i + 1}')
+                if self.log_backups > 0:
+                    os.replace(e.path, f'{e.path}.1')
+                else:
+                    os.remove(e.path)
+            except OSError:
+                continue
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_storage() -> StorageManager:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = StorageManager()
+        return _default
+
+
+def recording_finished(output: str, intermediate: Optional[str] = None, wait: bool = False):
+    """Best-effort hook for the recording front ends.
+
+    ``wait`` runs the cleanup in the caller, for short-lived processes like the CLI.
+    """
+    try:
+        mgr = default_storage()
+        if not wait:
+            mgr.recording_finished(output, intermediate)
+            return
+        mgr.note_added(output)
+        if intermediate:
+            mgr._delete_intermediate(intermediate)
+        mgr.collect_once()
+    except Exception:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Output folder quota and retention')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+    mgr = StorageManager()
+    mgr._scan()
+    u = mgr.usage()
+    quota = f"{u['quota_bytes'] / 1048576:.0f} MB quota" if u['quota_bytes'] else 'no quota'
+    print(f"{u['files']} files, {u['bytes'] / 1048576:.1f} MB, {quota}")
+    while mgr.collect_once(args.dry_run):
+        pass
+    if not args.dry_run:
+        u = mgr.usage()
+        print(f"deleted {u['deleted']} files ({u['freed'] / 1048576:.1f} MB), now {u['bytes'] / 1048576:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Decode round-trip test for the streaming GIF writer.
+
+Writes frames with ``GifWriter`` and decodes the file with Pillow, checking
+every pixel and the frame delays, so mistakes in the hand-written GIF89a
+blocks (descriptor flags, sub-rectangles, transparency) show up as wrong
+pixels instead of passing silently. Runs under pytest or directly:
+
+    python test_gif_writer.py
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from gif_writer import GifWriter, TRANSPARENT_INDEX  # noqa: E402
+
+W, H = 48, 40  # taller than 16 rows: Pillow interlaces those by default
+
+
+def _frames(rng):
+    """Random frames with full, partial, unchanged and repeated updates."""
+    a = rng.integers(0, TRANSPARENT_INDEX, (H, W)).astype(np.uint8)
+    b = a.copy()
+    b[5:21, 7:30] = rng.integers(0, TRANSPARENT_INDEX, (16, 23))
+    c = b.copy()
+    c[H - 1, W - 1] = (c[H - 1, W - 1] + 1) % TRANSPARENT_INDEX
+    d = rng.integers(0, TRANSPARENT_INDEX, (H, W)).astype(np.uint8)
+    return [(a, 100.0), (b, 40.0), (b.copy(), 60.0), (c, 33.3), (d, 200.0)]
+
+
+def _decode(path):
+    out = []
+    with Image.open(path) as im:
+        for i in range(im.n_frames):
+            im.seek(i)
+            out.append((np.asarray(im.convert('RGB')).astype(int), im.info.get('duration')))
+    return out
+
+
+def test_round_trip():
+    rng = np.random.default_rng(1)
+    palette = rng.integers(0, 256, (TRANSPARENT_INDEX, 3)).astype(np.uint8)
+    frames = _frames(rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'rt.gif')
+        with GifWriter(path, (W, H), palette) as writer:
+            for indexed, ms in frames:
+                writer.write(indexed, ms)
+        decoded = _decode(path)
+    # the repeated frame is merged into its predecessor
+    expected = [(frames[0][0], 100.0), (frames[1][0], 100.0), (frames[3][0], 33.3), (frames[4][0], 200.0)]
+    assert writer.frames_merged == 1
+    assert len(decoded) == len(expected)
+    elapsed = 0.0
+    for (rgb, delay), (indexed, ms) in zip(decoded, expected):
+        assert np.array_equal(rgb, palette[indexed].astype(int))
+        elapsed += delay
+    assert abs(elapsed - sum(ms for _, ms in expected)) < 10
+
+
+def test_local_palette():
+    rng = np.random.default_rng(2)
+    first, second = (rng.integers(0, 256, (TRANSPARENT_INDEX, 3)).astype(np.uint8) for _ in range(2))
+    frames = _frames(rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'lt.gif')
+        with GifWriter(path, (W, H), first) as writer:
+            writer.write(frames[0][0], 100.0)
+            writer.write(frames[1][0], 100.0)
+            writer.set_palette(second)
+            writer.write(frames[1][0], 100.0)  # same indices, new colours: not merged
+            writer.write(frames[3][0], 100.0)
+        decoded = _decode(path)
+    assert writer.palettes == 2 and writer.frames_written == 4
+    expected = [palette[indexed] for palette, indexed in
+                ((first, frames[0][0]), (first, frames[1][0]), (second, frames[1][0]), (second, frames[3][0]))]
+    for (rgb, _), want in zip(decoded, expected):
+        assert np.array_equal(rgb, want.astype(int))
+
+
+if __name__ == '__main__':
+    test_round_trip()
+    test_local_palette()
+    print('OK')
@@ -0,0 +1,46 @@
+"""Startup budget regression test for the GUI launcher.
+
+Starts main.py with SCREEN2GIF_STARTUP_PROBE=1 (offscreen Qt unless a
+platform is set), which prints the time from the start of main.py to the
+first paint of the launcher window and which heavy modules were already
+loaded, then exits. Runs under pytest or directly:
+
+    python test_startup_budget.py
+
+The budget can be overridden with SCREEN2GIF_STARTUP_BUDGET_S.
+"""
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BUDGET_S = float(os.environ.get('SCREEN2GIF_STARTUP_BUDGET_S', '1.0'))
+# none of these may be imported before the launcher window is shown
+DEFERRED = ('recorder', 'conversion_queue', 'preview', 'clipboard_clean', 'cv2', 'numpy', 'mss', 'imageio')
+
+
+def probe_startup() -> dict:
+    env = dict(os.environ, SCREEN2GIF_STARTUP_PROBE='1')
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    proc = subprocess.run([sys.executable, os.path.join(HERE, 'main.py')], cwd=HERE, env=env,
+                          capture_output=True, text=True, timeout=60)
+    for line in proc.stdout.splitlines():
+        if line.startswith('{'):
+            return json.loads(line)
+    raise AssertionError(f'no startup probe output (rc={proc.returncode}): {proc.stderr[-2000:]}')
+
+
+def test_startup_budget():
+    result = probe_startup()
+    early = [m for m in DEFERRED if m in result['loaded']]
+    assert not early, f'heavy modules imported before the launcher was shown: {early}'
+    assert result['startup_s'] <= BUDGET_S, f"launcher shown after {result['startup_s']:.3f}s (budget {BUDGET_S}s)"
+
+
+if __name__ == '__main__':
+    r = probe_startup()
+    print(f"launcher painted after {r['startup_s'] * 1000:.0f} ms (budget {BUDGET_S * 1000:.0f} ms), "
+          f"heavy modules loaded: {r['loaded'] or 'none'}")
+    test_startup_budget()
+    print('OK')
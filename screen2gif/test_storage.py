@@ -0,0 +1,96 @@
+"""Deletion-policy tests for the storage manager.
+
+Builds throwaway video/, gif/ and scratch folders and checks which files a
+cleanup pass removes. Runs under pytest or directly:
+
+    python test_storage.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import storage  # noqa: E402
+import utils  # noqa: E402
+
+OLD = time.time() - 7200  # well past GRACE_SECONDS
+
+
+def _touch(path, size=4096, when=OLD):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    os.utime(path, (when, when))
+    return path
+
+
+def test_intermediate_released_from_scratch_that_appeared_later():
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = utils._TMPFS_CANDIDATES
+        utils._TMPFS_CANDIDATES = (os.path.join(tmp, 'shm'),)
+        try:
+            os.makedirs(utils._TMPFS_CANDIDATES[0])
+            mgr = storage.StorageManager(os.path.join(tmp, 'base'), scratch_setting='auto')
+            mgr._scan()
+            # "auto" only picks tmpfs once memory allows: after the manager started
+            scratch = utils._private_subdir(utils._TMPFS_CANDIDATES[0])
+            mp4 = _touch(os.path.join(scratch, '20240101_000000_000_ab12.mp4'))
+            sidecar = _touch(os.path.join(scratch, '20240101_000000_000_ab12.frames.json'))
+            gif = _touch(os.path.join(tmp, 'base', 'gif', '20240101_000000_000_cd34.gif'))
+            mgr.note_added(gif)
+            mgr._delete_intermediate(mp4)
+            assert not os.path.exists(mp4) and not os.path.exists(sidecar)
+            assert os.path.exists(gif)
+        finally:
+            utils._TMPFS_CANDIDATES = saved
+
+
+def test_custom_scratch_intermediate_released():
+    with tempfile.TemporaryDirectory() as tmp:
+        setting = os.path.join(tmp, 'scratch')
+        mgr = storage.StorageManager(os.path.join(tmp, 'base'), scratch_setting=setting)
+        mp4 = _touch(os.path.join(utils.scratch_dir(setting), '20240101_000000_000_ab12.mp4'))
+        mgr._delete_intermediate(mp4)
+        assert not os.path.exists(mp4)
+
+
+def _outputs(base):
+    gif = _touch(os.path.join(base, 'gif', '20240101_000000_000_cd34.gif'), size=1 << 20)
+    foreign = [_touch(os.path.join(base, d, name), size=1 << 20)
+               for d, name in (('gif', 'holiday.gif'), ('video', 'talk.mp4'), ('gif', 'notes.txt'))]
+    return gif, foreign
+
+
+def test_finished_outputs_kept_without_quota_or_age():
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, 'base')
+        gif, foreign = _outputs(base)
+        mgr = storage.StorageManager(base, quota_bytes=0, max_age_days=0)
+        while mgr.collect_once():
+            pass
+        assert os.path.exists(gif) and all(os.path.exists(p) for p in foreign)
+        assert mgr.deleted == 0
+        assert mgr.usage()['files'] == 1  # only the app's own file is indexed
+
+
+def test_quota_and_age_never_touch_foreign_files():
+    for kwargs in ({'quota_bytes': 1}, {'max_age_days': 0.01}):
+        with tempfile.TemporaryDirectory() as tmp:
+            base = os.path.join(tmp, 'base')
+            gif, foreign = _outputs(base)
+            mgr = storage.StorageManager(base, **kwargs)
+            while mgr.collect_once():
+                pass
+            assert not os.path.exists(gif), kwargs  # opted in: the recording goes
+            assert all(os.path.exists(p) for p in foreign), kwargs
+            mgr._delete_intermediate(foreign[1])
+            assert os.path.exists(foreign[1])
+
+
+if __name__ == '__main__':
+    test_intermediate_released_from_scratch_that_appeared_later()
+    test_custom_scratch_intermediate_released()
+    test_finished_outputs_kept_without_quota_or_age()
+    test_quota_and_age_never_touch_foreign_files()
+    print('OK')
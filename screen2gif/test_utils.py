@@ -0,0 +1,78 @@
+"""Tests for output naming and the private scratch directory in utils.py.
+
+Runs under pytest or directly:
+
+    python test_utils.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import utils  # noqa: E402
+
+
+def _assert_fallback(root, planted):
+    d = utils._private_subdir(root)
+    assert d != planted and os.path.realpath(d) != os.path.realpath(planted)
+    assert utils._is_private(d)
+    assert utils._private_subdir(root) == d  # stable for the process
+    os.rmdir(d)
+    utils._fallback_dirs.pop(root, None)
+
+
+def test_private_subdir():
+    with tempfile.TemporaryDirectory() as root:
+        d = utils._private_subdir(root)
+        assert d == os.path.join(root, utils._subdir_name())
+        assert utils._is_private(d)
+
+
+def test_private_subdir_rejects_symlink():
+    with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as theirs:
+        os.chmod(theirs, 0o700)
+        planted = os.path.join(root, utils._subdir_name())
+        os.symlink(theirs, planted)
+        _assert_fallback(root, planted)
+
+
+def test_private_subdir_rejects_open_mode():
+    with tempfile.TemporaryDirectory() as root:
+        planted = os.path.join(root, utils._subdir_name())
+        os.mkdir(planted)
+        os.chmod(planted, 0o777)
+        _assert_fallback(root, planted)
+
+
+def test_private_subdir_rejects_other_owner():
+    if not hasattr(os, 'geteuid') or os.geteuid() != 0:
+        return  # only root can create a directory owned by someone else
+    with tempfile.TemporaryDirectory() as root:
+        planted = os.path.join(root, utils._subdir_name())
+        os.mkdir(planted, 0o700)
+        os.chown(planted, 4321, 4321)
+        _assert_fallback(root, planted)
+
+
+def test_unique_path_skips_taken_names():
+    suffixes = iter(['aaaa', 'bbbb', 'cccc'])
+    saved = utils.secrets.token_hex
+    utils.secrets.token_hex = lambda n: next(suffixes)
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, '20240101_000000_000.gif')
+            open(os.path.join(root, '20240101_000000_000_aaaa.gif'), 'wb').close()
+            # a writer still working on a name owns it too
+            open(utils.part_path(os.path.join(root, '20240101_000000_000_bbbb.gif')), 'wb').close()
+            assert utils.unique_path(path) == os.path.join(root, '20240101_000000_000_cccc.gif')
+    finally:
+        utils.secrets.token_hex = saved
+
+
+if __name__ == '__main__':
+    test_private_subdir()
+    test_private_subdir_rejects_symlink()
+    test_private_subdir_rejects_open_mode()
+    test_private_subdir_rejects_other_owner()
+    test_unique_path_skips_taken_names()
+    print('OK')
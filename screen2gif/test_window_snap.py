@@ -0,0 +1,70 @@
+"""Hit-testing and stacking-order tests for snap-to-window selection.
+
+Checks ``WindowIndex`` (the R-tree) against a brute-force scan over the
+same rectangles, with enough windows for several tree levels, and the
+stacking rules on small hand-made layouts served by ``StubProvider``. Runs
+under pytest or directly:
+
+    python test_window_snap.py
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from window_snap import StubProvider, WindowIndex, WindowRect, snapshot_index  # noqa: E402
+
+
+def _random_windows(rng, n):
+    rects = []
+    for z in range(n):
+        w, h = rng.randint(1, 900), rng.randint(1, 700)
+        rects.append(WindowRect(rng.randint(-200, 2400), rng.randint(-100, 1300), w, h, f'w{z}', z))
+    rng.shuffle(rects)  # the index must not depend on snapshot order
+    return rects
+
+
+def test_hits_match_brute_force():
+    rng = random.Random(7)
+    rects = _random_windows(rng, 300)  # three levels of 8-way nodes
+    index = WindowIndex(rects)
+    assert len(index) == len(rects)
+    points = [(rng.uniform(-300, 3500), rng.uniform(-200, 2100)) for _ in range(2000)]
+    # window edges: left/top are inside, right/bottom are outside
+    for r in rects[:50]:
+        points += [(r.x, r.y), (r.x + r.w - 1, r.y + r.h - 1), (r.x + r.w, r.y), (r.x, r.y + r.h)]
+    for px, py in points:
+        expected = [r for r in rects if r.contains(px, py)]
+        assert sorted(index.hits(px, py)) == sorted(expected)
+        top = index.topmost(px, py)
+        assert top == (min(expected, key=lambda r: r.z) if expected else None)
+
+
+def test_stacking_order():
+    provider = StubProvider([(0, 0, 800, 600, 'back', 2), (100, 100, 400, 300, 'middle', 1),
+                             (300, 200, 400, 300, 'front', 0)])
+    index = snapshot_index(provider)
+    assert index.topmost(50, 50).title == 'back'
+    assert index.topmost(150, 150).title == 'middle'
+    assert index.topmost(350, 250).title == 'front'  # all three overlap here
+    assert index.topmost(650, 450).title == 'front'  # outside back
+    assert index.topmost(900, 50) is None
+    assert len(index.hits(350, 250)) == 3
+
+
+def test_empty_and_degenerate():
+    index = WindowIndex([WindowRect(0, 0, 0, 100), WindowRect(10, 10, 100, 0)])
+    assert len(index) == 0 and index.topmost(5, 5) is None
+    assert snapshot_index(StubProvider()).topmost(0, 0) is None
+
+    class Broken(StubProvider):
+        def snapshot(self):
+            raise OSError('no display')
+    assert len(snapshot_index(Broken())) == 0
+
+
+if __name__ == '__main__':
+    test_hits_match_brute_force()
+    test_stacking_order()
+    test_empty_and_degenerate()
+    print('OK')
@@ -1,5 +1,20 @@
 import os
+import secrets
+import stat
+import tempfile
 from datetime import datetime
+from typing import Callable, List, Optional
+
+# Intermediate recordings go to the scratch directory. SCREEN2GIF_SCRATCH is a
+# path, "disk" (the package video/ folder) or "auto" (default): a RAM-backed
+# tmpfs when it and available memory both have SCREEN2GIF_SCRATCH_MIN_FREE_MB
+# to spare, otherwise video/. On a path or tmpfs the files go to a private
+# screen2gif-<uid> subdirectory, never into the directory itself; if that
+# name is taken by someone else, a fresh mkdtemp() directory is used instead.
+SCRATCH_SETTING = os.environ.get('SCREEN2GIF_SCRATCH', 'auto')
+SCRATCH_MIN_FREE = int(os.environ.get('SCREEN2GIF_SCRATCH_MIN_FREE_MB', '1024')) * 1024 * 1024
+_TMPFS_CANDIDATES = ('/dev/shm', os.environ.get('XDG_RUNTIME_DIR', ''))
+_fallback_dirs = {}  # scratch root -> mkdtemp() directory used in its place
 
 
 def ensure_dirs(base_dir=None):
@@ -9,7 +24,181 @@ def ensure_dirs(base_dir=None):
         os.makedirs(p, exist_ok=True)
 
 
+def part_path(path: str) -> str:
+    """Temporary name a writer uses until ``path`` is complete (keeps the extension for ffmpeg)."""
+    root, ext = os.path.splitext(path)
+    return f'{root}.part{ext}'
+
+
+def unique_path(path: str) -> str:
+    """Return ``path`` with a random suffix (``name_3fa2.ext``) that is not taken.
+
+    Checking for an existing file alone cannot tell apart two jobs, in this
+    or another process, that allocate a name in the same millisecond and have
+    not written anything yet; the random part does. Names whose file or
+    ``.part`` file exists are skipped as well.
+    """
+    root, ext = os.path.splitext(path)
+    while True:
+        cand = f'{root}_{secrets.token_hex(2)}{ext}'
+        if not os.path.exists(cand) and not os.path.exists(part_path(cand)):
+            return cand
+
+
+def _timestamp() -> str:
+    now = datetime.now()
+    return now.strftime('%Y%m%d_%H%M%S') + f'_{now.microsecond // 1000:03d}'
+
+
 def timestamped_filename(folder: str, ext: str) -> str:
     base = os.path.dirname(__file__)
-    ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-    return os.path.join(base, folder, f'{ts}.{ext}')
+    return unique_path(os.path.join(base, folder, f'{_timestamp()}.{ext}'))
+
+
+def _available_memory() -> Optional[int]:
+    try:
+        with open('/proc/meminfo', 'r', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _is_tmpfs(path: str) -> bool:
+    try:
+        real = os.path.realpath(path)
+        best, fstype = '', ''
+        with open('/proc/mounts', 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) > 2 and (real == parts[1] or real.startswith(parts[1].rstrip('/') + '/')) \
+                        and len(parts[1]) > len(best):
+                    best, fstype = parts[1], parts[2]
+        return fstype in ('tmpfs', 'ramfs')
+    except OSError:
+        return False
+
+
+def _subdir_name() -> str:
+    return f'screen2gif-{os.getuid()}' if hasattr(os, 'getuid') else 'screen2gif'
+
+
+def _is_private(path: str) -> bool:
+    """True if ``path`` is a real directory (not a symlink) owned by us with mode 0700."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    if not stat.S_ISDIR(st.st_mode):
+        return False
+    if not hasattr(os, 'getuid'):
+        return True  # no POSIX ownership to check
+    return st.st_uid == os.getuid() and stat.S_IMODE(st.st_mode) == 0o700
+
+
+def _private_subdir(root: str) -> str:
+    """Create (if needed) and return this user's ``screen2gif-<uid>`` directory under ``root``.
+
+    ``root`` may be world-writable (``/dev/shm``), so another user could have
+    created the name first or planted a symlink there; recordings are then
+    written to a private ``mkdtemp()`` directory instead, one per root and
+    process.
+    """
+    d = os.path.join(root, _subdir_name())
+    try:
+        os.makedirs(d, mode=0o700, exist_ok=True)
+    except OSError:
+        pass
+    if _is_private(d):
+        return d
+    if root not in _fallback_dirs:
+        _fallback_dirs[root] = tempfile.mkdtemp(prefix='screen2gif-')
+    return _fallback_dirs[root]
+
+
+def tmpfs_scratch(min_free: int = None) -> Optional[str]:
+    """A writable RAM-backed directory with ``min_free`` bytes of room, or None."""
+    min_free = SCRATCH_MIN_FREE if min_free is None else min_free
+    mem = _available_memory()
+    if mem is None or mem < min_free:
+        return None
+    for root in _TMPFS_CANDIDATES:
+        if not root or not os.path.isdir(root) or not os.access(root, os.W_OK) or not _is_tmpfs(root):
+            continue
+        try:
+            st = os.statvfs(root)
+            if st.f_bavail * st.f_frsize < min_free:
+                continue
+            return _private_subdir(root)
+        except OSError:
+            continue
+    return None
+
+
+def scratch_dir(setting: str = None) -> str:
+    """Directory for intermediate files, re-evaluated on every call (free memory changes)."""
+    setting = setting or SCRATCH_SETTING
+    disk = os.path.join(os.path.dirname(__file__), 'video')
+    if setting == 'disk':
+        return disk
+    if setting != 'auto':
+        # the storage manager evicts from the scratch directory, so it must be ours alone
+        return _private_subdir(setting)
+    return tmpfs_scratch() or disk
+
+
+def scratch_dirs(setting: str = None) -> List[str]:
+    """Every existing directory ``scratch_dir(setting)`` may have handed out.
+
+    With "auto" that is the private subdirectory of each tmpfs candidate and
+    video/, since free memory decides between them on every call; cleanup
+    has to cover all of them. Directories that fail the ownership checks are
+    never listed.
+    """
+    setting = setting or SCRATCH_SETTING
+    disk = os.path.join(os.path.dirname(__file__), 'video')
+    if setting == 'disk':
+        return [disk]
+    roots = [r for r in (_TMPFS_CANDIDATES if setting == 'auto' else (setting,)) if r]
+    out = [d for d in (os.path.join(r, _subdir_name()) for r in roots) if _is_private(d)]
+    out += [d for r, d in _fallback_dirs.items() if r in roots]
+    if setting == 'auto':
+        out.append(disk)
+    return out
+
+
+def scratch_filename(ext: str) -> str:
+    """Collision-free timestamped path for an intermediate file in ``scratch_dir()``."""
+    return unique_path(os.path.join(scratch_dir(), f'{_timestamp()}.{ext}'))
+
+
+def publish(part: str, path: str, ok: bool = True) -> bool:
+    """Move a finished ``part`` file to ``path`` atomically, or discard it if ``ok`` is false."""
+    if ok and os.path.exists(part):
+        try:
+            os.replace(part, path)
+            return True
+        except OSError:
+            pass
+    try:
+        os.remove(part)
+    except OSError:
+        pass
+    return False
+
+
+def atomic_write(path: str, writer: Callable[[str], bool]) -> bool:
+    """Run ``writer(tmp_path)`` and publish the result at ``path`` only if it succeeded.
+
+    Readers (cache lookups, the clipboard, the library) therefore never see a
+    half-written ``path``.
+    """
+    part = part_path(path)
+    ok = False
+    try:
+        ok = bool(writer(part))
+    finally:
+        ok = publish(part, path, ok)
+    return ok
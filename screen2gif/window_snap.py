@@ -0,0 +1,211 @@
+"""Top-level window rectangles for snap-to-window selection.
+
+A provider takes one snapshot of the visible top-level windows when record
+mode opens; ``WindowIndex`` packs the rectangles into a static R-tree
+(Sort-Tile-Recursive bulk load) so hover hit-testing visits O(log n) nodes
+even with hundreds of windows, and returns the topmost window under the
+cursor. Providers:
+
+``EwmhProvider``
+    X11 window managers implementing EWMH (``_NET_CLIENT_LIST_STACKING``),
+    via python-xlib when it is installed.
+``StubProvider``
+    a fixed list of rectangles, for tests and unsupported platforms.
+
+Rectangles are ``WindowRect`` tuples in physical (root window) pixels.
+"""
+import math
+import os
+import sys
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Sequence
+
+_NODE_SIZE = 8
+
+
+class WindowRect(NamedTuple):
+    x: int
+    y: int
+    w: int
+    h: int
+    title: str = ''
+    z: int = 0  # stacking position, 0 = topmost
+
+    def contains(self, px: float, py: float) -> bool:
+        return self.x <= px < self.x + self.w and self.y <= py < self.y + self.h
+
+
+class StubProvider:
+    name = 'stub'
+
+    def __init__(self, rects: Sequence = ()):
+        self.rects = [r if isinstance(r, WindowRect) else WindowRect(*r) for r in rects]
+
+    def available(self) -> bool:
+        return True
+
+    def snapshot(self) -> List[WindowRect]:
+        return list(self.rects)
+
+
+class EwmhProvider:
+    """Windows listed by an EWMH window manager, frame extents included."""
+    name = 'ewmh'
+
+    def __init__(self, display: str = None, exclude_pid: Optional[int] = None):
+        self.display_name = display
+        # our own overlay/toolbar/launcher windows are never snap targets
+        self.exclude_pid = os.getpid() if exclude_pid is None else exclude_pid
+
+    def available(self) -> bool:
+        if not sys.platform.startswith('linux') or not (self.display_name or os.environ.get('DISPLAY')):
+            return False
+        try:
+            import Xlib.display  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def snapshot(self) -> List[WindowRect]:
+        from Xlib import X, Xatom, display as xdisplay
+        d = xdisplay.Display(self.display_name)
+        try:
+            root = d.screen().root
+            atom = d.intern_atom
+            stacking = root.get_full_property(atom('_NET_CLIENT_LIST_STACKING'), Xatom.WINDOW)
+            if stacking is None:
+                return []
+            hidden = atom('_NET_WM_STATE_HIDDEN')
+            wm_pid = atom('_NET_WM_PID')
+            ids = list(stacking.value)[::-1]  # EWMH lists bottom-to-top
+            out = []
+            for win_id in ids:
+                try:
+                    win = d.create_resource_object('window', win_id)
+                    attrs = win.get_attributes()
+                    if attrs.map_state != X.IsViewable:
+                        continue
+                    pid = win.get_full_property(wm_pid, Xatom.CARDINAL)
+                    if pid is not None and pid.value and int(pid.value[0]) == self.exclude_pid:
+                        continue
+                    state = win.get_full_property(atom('_NET_WM_STATE'), Xatom.ATOM)
+                    if state is not None and hidden in state.value:
+                        continue
+                    geom = win.get_geometry()
+                    pos = win.translate_coords(root, 0, 0)
+                    x, y = -pos.x, -pos.y
+                    left = right = top = bottom = 0
+                    ext = win.get_full_property(atom('_NET_FRAME_EXTENTS'), Xatom.CARDINAL)
+                    if ext is not None and len(ext.value) == 4:
+                        left, right, top, bottom = (int(v) for v in ext.value)
+                    name = win.get_full_property(atom('_NET_WM_NAME'), atom('UTF8_STRING'))
+                    title = name.value.decode('utf-8', 'replace') if name is not None else ''
+                    out.append(WindowRect(x - left, y - top, geom.width + left + right,
+                                          geom.height + top + bottom, title, len(out)))
+                except Exception:
+                    continue
+            return out
+        finally:
+            d.close()
+
+
+_skip_logged = False
+
+
+def _log_skipped(reason: str):
+    """Note once per process why snapping fell back to ``StubProvider``."""
+    global _skip_logged
+    if _skip_logged:
+        return
+    _skip_logged = True
+    try:
+        logdir = os.path.join(os.path.dirname(__file__), 'logs')
+        os.makedirs(logdir, exist_ok=True)
+        with open(os.path.join(logdir, 'window_snap.log'), 'a', encoding='utf-8') as f:
+            f.write(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] EwmhProvider skipped: {reason}\n")
+    except Exception:
+        pass
+
+
+def default_provider():
+    ewmh = EwmhProvider()
+    if ewmh.available():
+        return ewmh
+    if sys.platform.startswith('linux') and (ewmh.display_name or os.environ.get('DISPLAY')):
+        _log_skipped('python-xlib is not installed, snap-to-window is disabled')
+    return StubProvider()
+
+
+class _Node:
+    __slots__ = ('box', 'children', 'leaf')
+
+    def __init__(self, children, leaf: bool):
+        self.children = children
+        self.leaf = leaf
+        if leaf:
+            self.box = (min(r.x for r in children), min(r.y for r in children),
+                        max(r.x + r.w for r in children), max(r.y + r.h for r in children))
+        else:
+            self.box = (min(c.box[0] for c in children), min(c.box[1] for c in children),
+                        max(c.box[2] for c in children), max(c.box[3] for c in children))
+
+
+def _str_pack(items, key_box, make):
+    """One level of Sort-Tile-Recursive packing."""
+    n = len(items)
+    leaves = math.ceil(n / _NODE_SIZE)
+    slabs = max(1, math.ceil(math.sqrt(leaves)))
+    per_slab = slabs * _NODE_SIZE
+    items = sorted(items, key=lambda it: key_box(it)[0] + key_box(it)[2])
+    out = []
+    for i in range(0, n, per_slab):
+        slab = sorted(items[i:i + per_slab], key=lambda it: key_box(it)[1] + key_box(it)[3])
+        for j in range(0, len(slab), _NODE_SIZE):
+            out.append(make(slab[j:j + _NODE_SIZE]))
+    return out
+
+
+class WindowIndex:
+    """Static R-tree over window rectangles answering "topmost window at (x, y)"."""
+
+    def __init__(self, rects: Sequence[WindowRect]):
+        self.rects = [r for r in rects if r.w > 0 and r.h > 0]
+        self.root = None
+        if not self.rects:
+            return
+        level = _str_pack(self.rects, lambda r: (r.x, r.y, r.x + r.w, r.y + r.h),
+                          lambda group: _Node(group, True))
+        while len(level) > 1:
+            level = _str_pack(level, lambda nd: nd.box, lambda group: _Node(group, False))
+        self.root = level[0]
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def hits(self, px: float, py: float) -> List[WindowRect]:
+        """All windows containing the point (unordered)."""
+        out = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            x0, y0, x1, y1 = node.box
+            if not (x0 <= px < x1 and y0 <= py < y1):
+                continue
+            if node.leaf:
+                out.extend(r for r in node.children if r.contains(px, py))
+            else:
+                stack.extend(node.children)
+        return out
+
+    def topmost(self, px: float, py: float) -> Optional[WindowRect]:
+        hits = self.hits(px, py)
+        return min(hits, key=lambda r: r.z) if hits else None
+
+
+def snapshot_index(provider=None) -> WindowIndex:
+    """Snapshot the current windows with ``provider`` (default: platform provider)."""
+    provider = provider or default_provider()
+    try:
+        return WindowIndex(provider.snapshot())
+    except Exception:
+        return WindowIndex([])